@@ -0,0 +1,364 @@
+"""
+audit_log.py - Append-only segmented audit log for Nexus AI
+
+Every agent decision is appended to the `audit_log` SQLite table with a
+monotonically increasing sequence number. Entries are grouped into fixed-size
+segments; only the active (unsealed) segment is held in memory.
+
+    audit_log       seq | segment | ts | agent | action | target | entry(JSON)
+                    indexes: ts, (target, seq)
+    audit_segments  one row per sealed segment: seq/ts bounds, entry count and
+                    the gzip JSONL archive path once compacted
+    audit_segment_targets
+                    (target, segment) for every target in a sealed segment,
+                    written when it is sealed
+
+Sealed segments beyond the newest AUDIT_HOT_SEGMENTS are compacted in a
+background thread: rows are written to `<archive_dir>/audit-<segment>.jsonl.gz`
+and then deleted from the hot table. Range queries transparently read both,
+skipping archives by their ts bounds and, for target queries, by
+audit_segment_targets. A relative archive_dir (and every stored archive path)
+is resolved against the database's directory, not the working directory, and
+a recorded archive that is missing raises FileNotFoundError instead of
+silently dropping its entries.
+"""
+
+import gzip
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Iterator, List, Optional
+
+SEGMENT_SIZE = int(os.getenv("AUDIT_SEGMENT_SIZE", "5000"))
+HOT_SEGMENTS = int(os.getenv("AUDIT_HOT_SEGMENTS", "4"))
+ARCHIVE_DIR  = os.getenv("AUDIT_ARCHIVE_DIR", "audit_archive")
+
+_FETCH_BATCH = 500
+
+
+class AuditLog:
+    def __init__(self, db_path: str, archive_dir: str = ARCHIVE_DIR,
+                 segment_size: int = SEGMENT_SIZE, hot_segments: int = HOT_SEGMENTS):
+        self.db_path = db_path
+        self.base_dir = os.path.dirname(os.path.abspath(db_path))
+        self.archive_dir = os.path.join(self.base_dir, archive_dir)     # no-op for absolute paths
+        self.segment_size = max(1, segment_size)
+        self.hot_segments = max(0, hot_segments)
+        self.active: List[dict] = []
+        self.last_seq = 0
+        self._lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+
+    # -- connection / schema ------------------------------------------------
+
+    def _connect(self, check_same_thread: bool = True):
+        return sqlite3.connect(self.db_path, timeout=30, check_same_thread=check_same_thread)
+
+    def init(self):
+        """Create tables and indexes, then reload the active segment into memory."""
+        conn = self._connect()
+        c = conn.cursor()
+        c.execute("""CREATE TABLE IF NOT EXISTS audit_log (
+            seq INTEGER PRIMARY KEY,
+            segment INTEGER NOT NULL,
+            ts TEXT NOT NULL,
+            agent TEXT,
+            action TEXT,
+            target TEXT,
+            entry TEXT NOT NULL
+        )""")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_audit_ts ON audit_log (ts)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_audit_target ON audit_log (target, seq)")
+        c.execute("""CREATE TABLE IF NOT EXISTS audit_segments (
+            segment INTEGER PRIMARY KEY,
+            first_seq INTEGER NOT NULL,
+            last_seq INTEGER NOT NULL,
+            first_ts TEXT NOT NULL,
+            last_ts TEXT NOT NULL,
+            entries INTEGER NOT NULL,
+            archive_path TEXT,
+            archived_at TIMESTAMP,
+            targets_indexed INTEGER NOT NULL DEFAULT 0
+        )""")
+        columns = {r[1] for r in c.execute("PRAGMA table_info(audit_segments)")}
+        if "targets_indexed" not in columns:
+            c.execute("ALTER TABLE audit_segments ADD COLUMN targets_indexed INTEGER NOT NULL DEFAULT 0")
+        c.execute("""CREATE TABLE IF NOT EXISTS audit_segment_targets (
+            target TEXT NOT NULL,
+            segment INTEGER NOT NULL,
+            PRIMARY KEY (target, segment)
+        ) WITHOUT ROWID""")
+        conn.commit()
+
+        row = c.execute("SELECT MAX(seq) FROM audit_log").fetchone()
+        seg_row = c.execute("SELECT MAX(last_seq) FROM audit_segments").fetchone()
+        self.last_seq = max(row[0] or 0, seg_row[0] or 0)
+        active_segment = self.last_seq // self.segment_size if self.last_seq % self.segment_size else None
+        self.active = []
+        if active_segment is not None:
+            rows = c.execute(
+                "SELECT entry FROM audit_log WHERE segment=? ORDER BY seq", (active_segment,)
+            ).fetchall()
+            self.active = [json.loads(r[0]) for r in rows]
+        conn.close()
+
+    # -- writes -------------------------------------------------------------
+
+    def append(self, entry: dict) -> dict:
+        """Append one entry, assigning `seq` and an ISO `ts`. Returns the stored entry."""
+        return self.extend([entry])[0]
+
+    def extend(self, entries) -> List[dict]:
+        """
+        Append entries in one transaction (legacy blob migration appends millions).
+        Segments filled along the way are sealed together and compacted once.
+        Returns the stored entries.
+        """
+        with self._lock:
+            seq = self.last_seq
+            active = list(self.active)
+            now = datetime.now().isoformat()
+            records, rows, seals, targets = [], [], [], []
+            for entry in entries:
+                seq += 1
+                record = dict(entry)
+                record["seq"] = seq
+                record.setdefault("ts", now)
+                segment = (seq - 1) // self.segment_size
+                rows.append((seq, segment, record["ts"], record.get("agent"), record.get("action"),
+                             record.get("target"), json.dumps(record, default=str)))
+                records.append(record)
+                active.append(record)
+                if seq % self.segment_size == 0:
+                    first = active[0]
+                    seals.append((segment, first["seq"], seq, first["ts"], record["ts"], len(active)))
+                    targets.extend((t, segment) for t in {e.get("target") for e in active} if t is not None)
+                    active = []
+            if not rows:
+                return records
+
+            conn = self._connect()
+            c = conn.cursor()
+            c.executemany(
+                "INSERT INTO audit_log (seq, segment, ts, agent, action, target, entry) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            c.executemany(
+                "INSERT OR REPLACE INTO audit_segments "
+                "(segment, first_seq, last_seq, first_ts, last_ts, entries, targets_indexed) "
+                "VALUES (?, ?, ?, ?, ?, ?, 1)",
+                seals,
+            )
+            c.executemany("INSERT OR IGNORE INTO audit_segment_targets (target, segment) VALUES (?, ?)", targets)
+            conn.commit()
+            conn.close()
+
+            self.last_seq = seq
+            self.active = active
+
+        if seals:
+            self.compact_async()
+        return records
+
+    def clear(self):
+        """Drop every entry and archive file (used by /api/reset)."""
+        with self._lock, self._compact_lock:
+            conn = self._connect()
+            paths = [r[0] for r in conn.execute(
+                "SELECT archive_path FROM audit_segments WHERE archive_path IS NOT NULL"
+            ).fetchall()]
+            conn.execute("DELETE FROM audit_log")
+            conn.execute("DELETE FROM audit_segments")
+            conn.execute("DELETE FROM audit_segment_targets")
+            conn.commit()
+            conn.close()
+            for path in paths:
+                try:
+                    os.remove(self._archive_file(path))
+                except OSError:
+                    pass
+            self.active = []
+            self.last_seq = 0
+
+    # -- compaction ---------------------------------------------------------
+
+    def _archive_file(self, path: str) -> str:
+        """Stored archive paths are relative to the database directory (absolute ones pass through)."""
+        return os.path.join(self.base_dir, path)
+
+    def _read_archive(self, segment: int, path: str) -> Iterator[dict]:
+        full = self._archive_file(path)
+        if not os.path.exists(full):
+            raise FileNotFoundError(f"Audit archive for segment {segment} is missing: {full}")
+        with gzip.open(full, "rt", encoding="utf-8") as fh:
+            for line in fh:
+                yield json.loads(line)
+
+    def missing_archives(self) -> List[str]:
+        """Recorded archive files that no longer exist on disk."""
+        conn = self._connect()
+        paths = [r[0] for r in conn.execute(
+            "SELECT archive_path FROM audit_segments WHERE archive_path IS NOT NULL ORDER BY segment"
+        ).fetchall()]
+        conn.close()
+        return [p for p in map(self._archive_file, paths) if not os.path.exists(p)]
+
+    def _index_targets(self, c):
+        """Backfill audit_segment_targets for segments sealed before it existed."""
+        for segment, path in c.execute(
+            "SELECT segment, archive_path FROM audit_segments WHERE targets_indexed=0 ORDER BY segment"
+        ).fetchall():
+            if path is None:
+                found = {r[0] for r in c.execute(
+                    "SELECT DISTINCT target FROM audit_log WHERE segment=?", (segment,)
+                )}
+            else:
+                try:
+                    found = {e.get("target") for e in self._read_archive(segment, path)}
+                except FileNotFoundError:
+                    continue
+            c.executemany(
+                "INSERT OR IGNORE INTO audit_segment_targets (target, segment) VALUES (?, ?)",
+                [(t, segment) for t in found if t is not None],
+            )
+            c.execute("UPDATE audit_segments SET targets_indexed=1 WHERE segment=?", (segment,))
+            c.connection.commit()
+
+    def compact(self) -> int:
+        """Archive sealed segments older than the hot window. Returns segments archived."""
+        with self._compact_lock:
+            conn = self._connect()
+            c = conn.cursor()
+            self._index_targets(c)
+            pending = [r[0] for r in c.execute(
+                "SELECT segment FROM audit_segments WHERE archive_path IS NULL ORDER BY segment"
+            ).fetchall()]
+            to_archive = pending[:max(0, len(pending) - self.hot_segments)]
+            if to_archive:
+                os.makedirs(self.archive_dir, exist_ok=True)
+            for segment in to_archive:
+                path = os.path.join(self.archive_dir, f"audit-{segment:08d}.jsonl.gz")
+                tmp = path + ".tmp"
+                with gzip.open(tmp, "wt", encoding="utf-8") as fh:
+                    for (entry,) in c.execute(
+                        "SELECT entry FROM audit_log WHERE segment=? ORDER BY seq", (segment,)
+                    ):
+                        fh.write(entry + "\n")
+                os.replace(tmp, path)
+                c.execute(
+                    "UPDATE audit_segments SET archive_path=?, archived_at=CURRENT_TIMESTAMP WHERE segment=?",
+                    (os.path.relpath(path, self.base_dir), segment),
+                )
+                c.execute("DELETE FROM audit_log WHERE segment=?", (segment,))
+                conn.commit()
+            conn.close()
+            return len(to_archive)
+
+    def compact_async(self):
+        threading.Thread(target=self._compact_quietly, name="audit-compactor", daemon=True).start()
+
+    def _compact_quietly(self):
+        try:
+            self.compact()
+        except Exception:
+            pass
+
+    # -- reads --------------------------------------------------------------
+
+    def count(self) -> int:
+        return self.last_seq
+
+    def tail(self, n: int = 200) -> List[dict]:
+        """Newest `n` entries in ascending seq order, served from memory when possible."""
+        n = max(0, n)
+        if n <= len(self.active):
+            return self.active[len(self.active) - n:]
+        conn = self._connect()
+        rows = conn.execute("SELECT entry FROM audit_log ORDER BY seq DESC LIMIT ?", (n,)).fetchall()
+        conn.close()
+        return [json.loads(r[0]) for r in reversed(rows)]
+
+    def query(self, since_seq: Optional[int] = None, start: Optional[str] = None,
+              end: Optional[str] = None, target: Optional[str] = None,
+              limit: Optional[int] = None) -> Iterator[dict]:
+        """
+        Stream entries in seq order. `since_seq` is exclusive, `start`/`end` are
+        inclusive ISO timestamps compared against `ts`. Archived segments are
+        pruned by their seq/ts bounds, and by audit_segment_targets for a
+        `target` query, before being opened. Raises FileNotFoundError if an
+        archive that may hold matches is missing.
+
+        Reads advance a seq cursor in short keyset batches. Compaction moves a
+        segment from the hot table to its archive in one transaction and never
+        back, so a hot batch is only trusted if no segment past the cursor was
+        archived by the time it was read; otherwise the archives are read first.
+        """
+        remaining = limit if limit is not None else -1
+        if remaining == 0:
+            return
+
+        def matches(e):
+            if start is not None and e.get("ts", "") < start:
+                return False
+            if end is not None and e.get("ts", "") > end:
+                return False
+            if target is not None and e.get("target") != target:
+                return False
+            return True
+
+        clauses, filters = [], []
+        if start is not None:
+            clauses.append("ts >= ?"); filters.append(start)
+        if end is not None:
+            clauses.append("ts <= ?"); filters.append(end)
+        if target is not None:
+            clauses.append("target = ?"); filters.append(target)
+        hot_sql = "SELECT seq, entry FROM audit_log WHERE " + " AND ".join(["seq > ?"] + clauses) + \
+                  " ORDER BY seq LIMIT ?"
+        archived_sql = (
+            "SELECT segment, last_seq, first_ts, last_ts, archive_path FROM audit_segments s "
+            "WHERE archive_path IS NOT NULL AND last_seq > ?"
+        )
+        archived_args = []
+        if target is not None:
+            archived_sql += (
+                " AND (targets_indexed = 0 OR EXISTS (SELECT 1 FROM audit_segment_targets t"
+                " WHERE t.target = ? AND t.segment = s.segment))"
+            )
+            archived_args.append(target)
+        archived_sql += " ORDER BY segment"
+
+        after = since_seq if since_seq is not None else 0
+        conn = self._connect(check_same_thread=False)
+        try:
+            while True:
+                archived = conn.execute(archived_sql, [after] + archived_args).fetchall()
+                for segment, last_seq, first_ts, last_ts, path in archived:
+                    skip = (start is not None and last_ts < start) or (end is not None and first_ts > end)
+                    if not skip:
+                        for e in self._read_archive(segment, path):
+                            if e["seq"] <= after or not matches(e):
+                                continue
+                            yield e
+                            remaining -= 1
+                            if remaining == 0:
+                                return
+                    after = max(after, last_seq)
+                if archived:
+                    continue
+
+                rows = conn.execute(hot_sql, [after] + filters + [_FETCH_BATCH]).fetchall()
+                if conn.execute(archived_sql + " LIMIT 1", [after] + archived_args).fetchone():
+                    continue    # compaction ran between the reads; drain the new archive first
+                if not rows:
+                    return
+                for seq, entry in rows:
+                    yield json.loads(entry)
+                    after = seq
+                    remaining -= 1
+                    if remaining == 0:
+                        return
+        finally:
+            conn.close()
@@ -0,0 +1,371 @@
+"""
+crm_sync.py - Batched, idempotent CRM sync engine for the Closer agent
+
+Closer enqueues opportunities into the `crm_outbox` SQLite table; SyncEngine
+drains it in bulk upserts through a CRMAdapter.
+
+    crm_outbox  idempotency_key (PK) | lead_id | payload | status | attempts |
+                last_error | next_attempt_at | crm_id | created_at | synced_at
+
+The idempotency key is derived from the lead id, so enqueueing the same lead
+twice is a no-op and a retried batch carries the same keys; the CRM answers
+"duplicate" instead of creating a second opportunity. Failed records back off
+exponentially and are parked as "dead" after CRM_MAX_ATTEMPTS.
+
+Adapters:
+    SimulatedCRMAdapter  in-process stand-in used when CRM_URL is unset
+    HTTPCRMAdapter       JSON bulk-upsert API (see mock_crm.py) over a pooled
+                         keep-alive http.client connection set
+"""
+
+import hashlib
+import http.client
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+CRM_URL             = os.getenv("CRM_URL", "")
+CRM_BATCH_SIZE      = int(os.getenv("CRM_BATCH_SIZE", "200"))
+CRM_MAX_CONCURRENCY = int(os.getenv("CRM_MAX_CONCURRENCY", "4"))
+CRM_MAX_ATTEMPTS    = int(os.getenv("CRM_MAX_ATTEMPTS", "5"))
+CRM_TIMEOUT         = float(os.getenv("CRM_TIMEOUT", "10"))
+
+BACKOFF_BASE_SECONDS = 2.0
+BACKOFF_MAX_SECONDS  = 300.0
+
+_SYNCED_STATUSES = {"created", "updated", "duplicate"}
+
+
+class CRMError(Exception):
+    """Whole-batch failure (transport error or non-2xx); every record in the batch is retried."""
+
+
+def idempotency_key(lead: dict) -> str:
+    return hashlib.sha256(f"nexus-opportunity:{lead.get('id')}".encode()).hexdigest()[:32]
+
+
+def opportunity_payload(lead: dict) -> dict:
+    budget = str(lead.get("budget", ""))
+    return {
+        "external_id": lead.get("id"),
+        "name": f"{lead.get('company', 'Unknown')} - NexusAI",
+        "account": lead.get("company"),
+        "contact_role": lead.get("role"),
+        "location": lead.get("location"),
+        "employees": lead.get("employees"),
+        "amount_lakhs": budget,
+        "icp_score": lead.get("icp_score"),
+        "stage": "Qualification",
+    }
+
+# A dead outbox row can be requeued, so "Failed" leads still accept later results.
+OPEN_LEAD_STATES = ("Pending", "Retrying", "Failed")
+
+
+def apply_report(report: dict, lead_by_id: Callable[[str], Optional[dict]]) -> List[tuple]:
+    """
+    Copy a flush report onto the leads' crm_sync state: synced -> "Synced" with
+    crm_id, failures -> "Retrying" or "Failed" once dead. Leads already synced
+    are left alone. Returns (lead, item) for every lead newly synced.
+    """
+    newly_synced = []
+    for item in report["synced"]:
+        lead = lead_by_id(item["lead_id"])
+        if lead is None or lead.get("crm_sync") not in OPEN_LEAD_STATES:
+            continue
+        lead["crm_sync"] = "Synced"
+        lead["crm_id"] = item["crm_id"]
+        newly_synced.append((lead, item))
+    for item in report["failures"]:
+        lead = lead_by_id(item["lead_id"])
+        if lead is not None and lead.get("crm_sync") in OPEN_LEAD_STATES:
+            lead["crm_sync"] = "Failed" if item["dead"] else "Retrying"
+            lead["last_log"] = f"CRM sync error: {item['error'][:60]}"
+    return newly_synced
+
+
+def reopen_failed(lead_ids: List[str], lead_by_id: Callable[[str], Optional[dict]]) -> int:
+    """Move "Failed" leads whose dead rows were requeued back to "Retrying". Returns leads moved."""
+    moved = 0
+    for lead_id in lead_ids:
+        lead = lead_by_id(lead_id)
+        if lead is not None and lead.get("crm_sync") == "Failed":
+            lead["crm_sync"] = "Retrying"
+            moved += 1
+    return moved
+
+# ---------------------------------------------------------------------------
+# ADAPTERS
+# ---------------------------------------------------------------------------
+
+
+class CRMAdapter:
+    """Bulk upsert interface. Returns one result dict per record, in order."""
+
+    name = "CRM"
+
+    def upsert_opportunities(self, records: List[dict]) -> List[dict]:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class SimulatedCRMAdapter(CRMAdapter):
+    name = "Salesforce (simulated)"
+
+    def __init__(self):
+        self._by_key: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def upsert_opportunities(self, records: List[dict]) -> List[dict]:
+        results = []
+        with self._lock:
+            for r in records:
+                key = r["idempotency_key"]
+                if key in self._by_key:
+                    results.append({"idempotency_key": key, "status": "duplicate", "id": self._by_key[key]})
+                    continue
+                crm_id = f"SIM-{len(self._by_key) + 1:06d}"
+                self._by_key[key] = crm_id
+                results.append({"idempotency_key": key, "status": "created", "id": crm_id})
+        return results
+
+
+class _ConnectionPool:
+    def __init__(self, base_url: str, size: int, timeout: float):
+        parts = urlsplit(base_url)
+        self.scheme = parts.scheme or "http"
+        self.host = parts.hostname or "localhost"
+        self.port = parts.port
+        self.prefix = parts.path.rstrip("/")
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue[http.client.HTTPConnection]" = queue.LifoQueue(maxsize=size)
+
+    def _new(self) -> http.client.HTTPConnection:
+        cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+        return cls(self.host, self.port, timeout=self.timeout)
+
+    def request(self, method: str, path: str, body: Optional[dict] = None):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._new()
+        data = json.dumps(body).encode() if body is not None else None
+        headers = {"Content-Type": "application/json", "Connection": "keep-alive"}
+        try:
+            conn.request(method, self.prefix + path, body=data, headers=headers)
+            resp = conn.getresponse()
+            payload = resp.read()
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            raise
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+        return resp.status, payload
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class HTTPCRMAdapter(CRMAdapter):
+    def __init__(self, base_url: str, pool_size: int = CRM_MAX_CONCURRENCY, timeout: float = CRM_TIMEOUT):
+        self.name = f"CRM @ {base_url}"
+        self.pool = _ConnectionPool(base_url, pool_size, timeout)
+
+    def upsert_opportunities(self, records: List[dict]) -> List[dict]:
+        try:
+            status, payload = self.pool.request("POST", "/api/opportunities/bulk", {"records": records})
+        except (OSError, http.client.HTTPException) as e:
+            raise CRMError(f"transport: {e}") from e
+        if status >= 300:
+            raise CRMError(f"HTTP {status}: {payload[:80].decode(errors='replace')}")
+        results = json.loads(payload).get("results", [])
+        if len(results) != len(records):
+            raise CRMError(f"expected {len(records)} results, got {len(results)}")
+        return results
+
+    def close(self):
+        self.pool.close()
+
+
+def make_adapter() -> CRMAdapter:
+    return HTTPCRMAdapter(CRM_URL) if CRM_URL else SimulatedCRMAdapter()
+
+# ---------------------------------------------------------------------------
+# OUTBOX + ENGINE
+# ---------------------------------------------------------------------------
+
+
+class SyncEngine:
+    def __init__(self, db_path: str, adapter: Optional[CRMAdapter] = None,
+                 batch_size: int = CRM_BATCH_SIZE, concurrency: int = CRM_MAX_CONCURRENCY,
+                 max_attempts: int = CRM_MAX_ATTEMPTS):
+        self.db_path = db_path
+        self.adapter = adapter or make_adapter()
+        self.batch_size = max(1, batch_size)
+        self.concurrency = max(1, concurrency)
+        self.max_attempts = max(1, max_attempts)
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="crm-sync")
+        self._flush_lock = threading.Lock()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def init(self):
+        conn = self._connect()
+        conn.execute("""CREATE TABLE IF NOT EXISTS crm_outbox (
+            idempotency_key TEXT PRIMARY KEY,
+            lead_id TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            next_attempt_at REAL NOT NULL DEFAULT 0,
+            crm_id TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            synced_at TIMESTAMP
+        )""")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_crm_outbox_due ON crm_outbox (status, next_attempt_at)")
+        conn.commit()
+        conn.close()
+
+    def enqueue(self, leads: List[dict]) -> int:
+        """Add opportunities to the outbox. Already-queued leads are ignored. Returns rows added."""
+        rows = []
+        for lead in leads:
+            key = idempotency_key(lead)
+            record = opportunity_payload(lead)
+            record["idempotency_key"] = key
+            rows.append((key, lead.get("id"), json.dumps(record, default=str)))
+        conn = self._connect()
+        before = conn.total_changes
+        conn.executemany(
+            "INSERT OR IGNORE INTO crm_outbox (idempotency_key, lead_id, payload) VALUES (?, ?, ?)", rows
+        )
+        conn.commit()
+        added = conn.total_changes - before
+        conn.close()
+        return added
+
+    def flush(self, max_batches: Optional[int] = None) -> dict:
+        """
+        Send due outbox rows as concurrent bulk upserts. Only one flush runs at a
+        time; a concurrent caller gets {"busy": True} instead of double-sending.
+        """
+        if not self._flush_lock.acquire(blocking=False):
+            return {"busy": True, "sent": 0, "failed": 0, "dead": 0, "batches": 0, "synced": [], "failures": []}
+        try:
+            return self._flush(max_batches)
+        finally:
+            self._flush_lock.release()
+
+    def _flush(self, max_batches: Optional[int]) -> dict:
+        t0 = time.time()
+        limit = self.batch_size * (max_batches or self.concurrency)
+        conn = self._connect()
+        due = conn.execute(
+            "SELECT idempotency_key, lead_id, payload, attempts FROM crm_outbox "
+            "WHERE status='pending' AND next_attempt_at <= ? ORDER BY created_at, rowid LIMIT ?",
+            (time.time(), limit),
+        ).fetchall()
+        batches = [due[i:i + self.batch_size] for i in range(0, len(due), self.batch_size)]
+        futures = [
+            self._executor.submit(self._send, [json.loads(row[2]) for row in batch])
+            for batch in batches
+        ]
+
+        sent, failed, dead = 0, 0, 0
+        synced: List[dict] = []
+        failures: List[dict] = []
+        for batch, future in zip(batches, futures):
+            try:
+                results = future.result()
+                by_key = {r.get("idempotency_key"): r for r in results}
+            except Exception as e:
+                by_key = {}
+                batch_error = str(e)[:200]
+            else:
+                batch_error = ""
+            for key, lead_id, _, attempts in batch:
+                result = by_key.get(key)
+                if result and result.get("status") in _SYNCED_STATUSES:
+                    conn.execute(
+                        "UPDATE crm_outbox SET status='sent', crm_id=?, attempts=?, last_error=NULL, "
+                        "synced_at=CURRENT_TIMESTAMP WHERE idempotency_key=?",
+                        (result.get("id"), attempts + 1, key),
+                    )
+                    sent += 1
+                    synced.append({"lead_id": lead_id, "crm_id": result.get("id"), "status": result["status"]})
+                    continue
+                error = batch_error or str((result or {}).get("error", "missing result"))[:200]
+                attempts += 1
+                if attempts >= self.max_attempts:
+                    status, dead = "dead", dead + 1
+                else:
+                    status = "pending"
+                delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** (attempts - 1)))
+                conn.execute(
+                    "UPDATE crm_outbox SET status=?, attempts=?, last_error=?, next_attempt_at=? "
+                    "WHERE idempotency_key=?",
+                    (status, attempts, error, time.time() + delay, key),
+                )
+                failed += 1
+                failures.append({"lead_id": lead_id, "error": error, "dead": status == "dead"})
+        conn.commit()
+        conn.close()
+        return {
+            "busy": False,
+            "batches": len(batches),
+            "sent": sent,
+            "failed": failed,
+            "dead": dead,
+            "synced": synced,
+            "failures": failures,
+            "execution_ms": round((time.time() - t0) * 1000, 1),
+        }
+
+    def _send(self, records: List[dict]) -> List[dict]:
+        return self.adapter.upsert_opportunities(records)
+
+    def stats(self) -> dict:
+        conn = self._connect()
+        counts = dict(conn.execute("SELECT status, COUNT(*) FROM crm_outbox GROUP BY status").fetchall())
+        conn.close()
+        return {
+            "adapter": self.adapter.name,
+            "batch_size": self.batch_size,
+            "concurrency": self.concurrency,
+            "pending": counts.get("pending", 0),
+            "sent": counts.get("sent", 0),
+            "dead": counts.get("dead", 0),
+        }
+
+    def requeue_dead(self) -> List[str]:
+        """Re-arm dead rows for another full round of attempts. Returns their lead ids."""
+        conn = self._connect()
+        lead_ids = [r[0] for r in conn.execute("SELECT lead_id FROM crm_outbox WHERE status='dead'").fetchall()]
+        conn.execute(
+            "UPDATE crm_outbox SET status='pending', attempts=0, next_attempt_at=0 WHERE status='dead'"
+        )
+        conn.commit()
+        conn.close()
+        return lead_ids
+
+    def clear(self):
+        conn = self._connect()
+        conn.execute("DELETE FROM crm_outbox")
+        conn.commit()
+        conn.close()
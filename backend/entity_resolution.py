@@ -0,0 +1,479 @@
+"""
+entity_resolution.py - Lead deduplication for Nexus AI
+
+Leads are normalized (company suffixes/punctuation, city and role aliases) and
+indexed incrementally so overlapping imports collapse before Hunter scores them.
+
+Each company gets two normalized forms (company_keys):
+
+    name -> legal suffixes dropped, plus the lead's own city if enough remains
+    key  -> name without generic words ("services", "group", ...) if enough remains
+
+Stripping never leaves fewer than MIN_KEY_TOKENS tokens / MIN_KEY_CHARS chars,
+so "Hyderabad Pharma" and "Pharma Solutions" keep distinct keys.
+
+Candidate generation is blocked by normalized location:
+
+    exact key   -> (location, key) dict, O(1) per lead
+    MinHash LSH -> character 3-gram signatures of the key split into bands;
+                   only leads sharing a band bucket are compared
+
+Every candidate, exact hits included, is confirmed with name trigram Jaccard
+>= threshold. Per-shingle hash rows are cached, so a signature is one C-level
+min over a handful of tuples, and single-entry buckets hold the bare id instead of a list (buckets loaded
+from disk stay \\x1f-joined strings until they next grow).
+
+Only leads still in "New" status are absorbed. A processed survivor only gains
+the absorbed id in `merged_ids`; a New survivor also inherits fields it lacks.
+Absorbed records are kept in the `entity_merges` table so unmerge() can undo a
+bad merge.
+
+With a db_path the index is persisted as it grows (`entity_index` holds key
+and name per entity, `entity_buckets` the LSH buckets), and load() rebuilds it
+at boot without recomputing signatures. resolve_rows() then only has to index leads
+added since, from (id, company, location, status, keyed) summary rows; only
+unkeyed leads and merge participants are fetched.
+"""
+
+import json
+import re
+import sqlite3
+import sys
+import time
+import unicodedata
+import zlib
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+LOCATION_ALIASES = {
+    "vizag": "Visakhapatnam", "visakhapatnam": "Visakhapatnam", "vishakhapatnam": "Visakhapatnam",
+    "hyderabad": "Hyderabad", "hyd": "Hyderabad", "secunderabad": "Hyderabad",
+    "bengaluru": "Bengaluru", "bangalore": "Bengaluru", "blr": "Bengaluru",
+    "chennai": "Chennai", "madras": "Chennai",
+    "vijayawada": "Vijayawada", "bezawada": "Vijayawada",
+    "andhra pradesh": "Andhra Pradesh", "ap": "Andhra Pradesh", "andhra": "Andhra Pradesh",
+    "kochi": "Kochi", "cochin": "Kochi",
+    "tirupati": "Tirupati", "tirupathi": "Tirupati",
+}
+
+ROLE_ALIASES = {
+    "ciso": "CISO", "chief information security officer": "CISO",
+    "cto": "CTO", "chief technology officer": "CTO",
+    "vp engineering": "VP Engineering", "vp eng": "VP Engineering",
+    "vp of engineering": "VP Engineering", "vice president engineering": "VP Engineering",
+    "vice president of engineering": "VP Engineering",
+    "it director": "IT Director", "director it": "IT Director", "director of it": "IT Director",
+    "head of it": "IT Director", "it head": "IT Director",
+    "security manager": "Security Manager", "information security manager": "Security Manager",
+    "ceo": "CEO", "chief executive officer": "CEO",
+    "coo": "COO", "chief operating officer": "COO",
+}
+
+LEGAL_SUFFIXES = frozenset({
+    "the", "and", "pvt", "private", "ltd", "limited", "llp", "inc", "incorporated",
+    "corp", "corporation", "co", "company", "plc",
+})
+GENERIC_WORDS = frozenset({
+    "india", "industries", "industry", "group", "enterprises", "holdings", "solutions", "services",
+})
+
+SIMILARITY_THRESHOLD = 0.7
+BANDS = 10
+ROWS = 4
+MIN_KEY_TOKENS = 2
+MIN_KEY_CHARS = 6
+
+_MERSENNE = (1 << 61) - 1
+_ID_SEP = "\x1f"
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def _fold(text) -> str:
+    text = unicodedata.normalize("NFKD", str(text or "")).encode("ascii", "ignore").decode()
+    return _NON_ALNUM.sub(" ", text.lower().replace("&", " and ")).strip()
+
+
+def normalize_location(location) -> str:
+    folded = _fold(location)
+    return LOCATION_ALIASES.get(folded, str(location or "").strip())
+
+
+def normalize_role(role) -> str:
+    folded = _fold(role)
+    return ROLE_ALIASES.get(folded, str(role or "").strip())
+
+
+def _strip(tokens: List[str], drop) -> List[str]:
+    """`tokens` without the dropped ones, unless too little of the name would be left."""
+    kept = [t for t in tokens if not drop(t)]
+    if len(kept) < MIN_KEY_TOKENS or len(" ".join(kept)) < MIN_KEY_CHARS:
+        return tokens
+    return kept
+
+
+def company_keys(company, location: str = "") -> Tuple[str, str]:
+    """
+    (key, name) for a company. `name` drops legal suffixes and, when enough is
+    left, the lead's own city; `key` additionally drops generic words. The key
+    blocks candidates, the name confirms them.
+    """
+    tokens = _fold(company).split()
+    tokens = [t for t in tokens if t not in LEGAL_SUFFIXES] or tokens
+    city = location.lower()
+    name = _strip(tokens, lambda t: LOCATION_ALIASES.get(t, "").lower() == city)
+    key = _strip(name, GENERIC_WORDS.__contains__)
+    return " ".join(key), " ".join(name)
+
+
+def normalize_company(company, location: str = "") -> str:
+    """Blocking key: lowercase company tokens with legal/generic suffixes and the lead's own city removed."""
+    return company_keys(company, location)[0]
+
+
+def shingles(key: str) -> frozenset:
+    padded = f" {key} "
+    if len(padded) < 3:
+        return frozenset({padded})
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def jaccard(a: frozenset, b: frozenset) -> float:
+    if not a or not b:
+        return 0.0
+    inter = len(a & b)
+    return inter / (len(a) + len(b) - inter)
+
+
+class EntityIndex:
+    def __init__(self, threshold: float = SIMILARITY_THRESHOLD, bands: int = BANDS, rows: int = ROWS,
+                 fetch: Optional[Callable[[str], Optional[dict]]] = None, db_path: Optional[str] = None):
+        self.threshold = threshold
+        self.fetch = fetch                                  # lead id -> lead, for leads indexed by summary
+        self.db_path = db_path                              # persist entities + merges here when set
+        self.bands = bands
+        self.rows = rows
+        n = bands * rows
+        self._coeffs = [(2 * i + 1) * 0x9E3779B97F4A7C15 % _MERSENNE for i in range(n)]
+        self._offsets = [(i + 1) * 0xC2B2AE3D27D4EB4F % _MERSENNE for i in range(n)]
+        self._shingle_rows: Dict[str, Tuple[int, ...]] = {}
+        self._lsh_tag = f"{bands}x{rows}:{sys.hash_info.algorithm}:{sys.version_info[0]}.{sys.version_info[1]}"
+        self._reset()
+
+    def _reset(self):
+        self.entities: Dict[str, Tuple[str, str, str]] = {} # lead id -> (location, company key, name)
+        self.exact: Dict[Tuple[str, str], str] = {}         # (location, company key) -> lead id
+        self.buckets: Dict[int, object] = {}                # band hash -> lead id(s) as str, or [lead ids]
+        self.leads_by_id: Dict[str, dict] = {}
+        self.merged_total = 0
+        self.loaded = self.db_path is None
+        self._pending: List[tuple] = []                     # entity rows not yet persisted
+        self._pending_bands: Dict[int, List[str]] = {}      # band hash -> lead ids added since the last flush
+        self._pending_merges: List[tuple] = []
+
+    def clear(self):
+        self._reset()
+        if self.db_path is not None:
+            conn = self._connect()
+            conn.execute("DELETE FROM entity_index")
+            conn.execute("DELETE FROM entity_buckets")
+            conn.execute("DELETE FROM entity_merges")
+            conn.commit()
+            conn.close()
+            self.loaded = True
+
+    def __len__(self):
+        return len(self.entities)
+
+    # -- persistence --------------------------------------------------------
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def init(self):
+        conn = self._connect()
+        conn.execute("""CREATE TABLE IF NOT EXISTS entity_index (
+            lead_id TEXT PRIMARY KEY,
+            location TEXT NOT NULL,
+            key TEXT NOT NULL,
+            name TEXT NOT NULL
+        )""")
+        conn.execute("""CREATE TABLE IF NOT EXISTS entity_buckets (
+            band INTEGER PRIMARY KEY,
+            ids TEXT NOT NULL
+        )""")
+        conn.execute("""CREATE TABLE IF NOT EXISTS entity_merges (
+            lead_id TEXT PRIMARY KEY,
+            survivor_id TEXT NOT NULL,
+            record TEXT NOT NULL,
+            inherited TEXT NOT NULL,
+            merged_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )""")
+        conn.execute("CREATE TABLE IF NOT EXISTS entity_meta (name TEXT PRIMARY KEY, value TEXT)")
+        conn.commit()
+        conn.close()
+
+    def load(self) -> int:
+        """
+        Rebuild the in-memory index from the persisted entities and LSH buckets,
+        so a restart does not recompute any MinHash signatures. Rows written under
+        other LSH parameters (or another interpreter's int hash) are discarded and
+        re-keyed by the next resolve. Returns the number of entities loaded.
+        """
+        self._reset()
+        conn = self._connect()
+        row = conn.execute("SELECT value FROM entity_meta WHERE name='lsh'").fetchone()
+        if row is None or row[0] != self._lsh_tag:
+            conn.execute("DELETE FROM entity_index")
+            conn.execute("DELETE FROM entity_buckets")
+            conn.execute("INSERT OR REPLACE INTO entity_meta (name, value) VALUES ('lsh', ?)", (self._lsh_tag,))
+            conn.commit()
+        rows = conn.execute("SELECT lead_id, location, key, name FROM entity_index ORDER BY rowid").fetchall()
+        self.entities = {lead_id: (location, key, name) for lead_id, location, key, name in rows}
+        # Reversed, so the first-indexed entity owns its exact key.
+        self.exact = {(location, key): lead_id for lead_id, location, key, _ in reversed(rows)}
+        self.buckets = dict(conn.execute("SELECT band, ids FROM entity_buckets"))
+        self.merged_total = conn.execute("SELECT COUNT(*) FROM entity_merges").fetchone()[0]
+        conn.close()
+        self.loaded = True
+        return len(self.entities)
+
+    def _flush(self):
+        pending, bands, merges = self._pending, self._pending_bands, self._pending_merges
+        self._pending, self._pending_bands, self._pending_merges = [], {}, []
+        if self.db_path is None or not (pending or merges):
+            return
+        conn = self._connect()
+        conn.executemany(
+            "INSERT OR REPLACE INTO entity_index (lead_id, location, key, name) VALUES (?, ?, ?, ?)", pending
+        )
+        # Append to the stored buckets rather than rewriting them; sorted keys keep the B-tree writes local.
+        conn.executemany(
+            "INSERT INTO entity_buckets (band, ids) VALUES (?, ?) "
+            "ON CONFLICT (band) DO UPDATE SET ids = ids || char(31) || excluded.ids",
+            ((bk, _ID_SEP.join(bands[bk])) for bk in sorted(bands)),
+        )
+        conn.executemany(
+            "INSERT OR REPLACE INTO entity_merges (lead_id, survivor_id, record, inherited) VALUES (?, ?, ?, ?)",
+            merges,
+        )
+        conn.commit()
+        conn.close()
+
+    # -- indexing -----------------------------------------------------------
+
+    def _rows_for(self, shingle: str) -> Tuple[int, ...]:
+        rows = self._shingle_rows.get(shingle)
+        if rows is None:
+            h = zlib.crc32(shingle.encode())
+            rows = tuple((a * h + b) % _MERSENNE for a, b in zip(self._coeffs, self._offsets))
+            self._shingle_rows[shingle] = rows
+        return rows
+
+    def _band_keys(self, location: str, grams: frozenset) -> List[int]:
+        # Integer-only tuples hash the same in every process, so band keys can be persisted.
+        signature = tuple(map(min, zip(*(self._rows_for(g) for g in grams))))
+        r = self.rows
+        loc = zlib.crc32(location.encode())
+        return [hash((loc, b) + signature[b * r:(b + 1) * r]) for b in range(self.bands)]
+
+    def _lead(self, lead_id: str) -> Optional[dict]:
+        lead = self.leads_by_id.get(lead_id)
+        if lead is None and self.fetch is not None:
+            lead = self.fetch(lead_id)
+        return lead
+
+    def _add(self, lead_id: str, location: str, key: str, name: str, band_keys: List[int],
+             lead: Optional[dict] = None):
+        self.entities[lead_id] = (location, key, name)
+        self.exact.setdefault((location, key), lead_id)
+        if lead is not None:
+            self.leads_by_id[lead_id] = lead
+        buckets = self.buckets
+        for bk in band_keys:
+            existing = buckets.get(bk)
+            if existing is None:
+                buckets[bk] = lead_id
+            elif isinstance(existing, list):
+                existing.append(lead_id)
+            else:
+                buckets[bk] = existing.split(_ID_SEP) + [lead_id]
+        if self.db_path is not None:
+            self._pending.append((lead_id, location, key, name))
+            pending = self._pending_bands
+            for bk in band_keys:
+                pending.setdefault(bk, []).append(lead_id)
+
+    def _match(self, location: str, key: str, name: str, band_keys: List[int]) -> Optional[str]:
+        """Best same-location entity whose name trigram Jaccard clears the threshold."""
+        grams = shingles(name)
+        best, best_score = None, self.threshold
+        hit = self.exact.get((location, key))
+        candidates = [hit] if hit is not None else []
+        for bk in band_keys:
+            bucket = self.buckets.get(bk)
+            if bucket is not None:
+                candidates.extend(bucket if isinstance(bucket, list) else bucket.split(_ID_SEP))
+        seen = set()
+        for cand in candidates:
+            if cand in seen:
+                continue
+            seen.add(cand)
+            cand_loc, _, cand_name = self.entities[cand]
+            if cand_loc != location:
+                continue
+            score = jaccard(grams, shingles(cand_name))
+            if score >= best_score:
+                best, best_score = cand, score
+        return best
+
+    def _merge(self, match: str, duplicate: dict) -> bool:
+        """Absorb `duplicate` into entity `match`, keeping its record for unmerge()."""
+        survivor = self._lead(match)
+        if survivor is None:
+            return False
+        inherited = _absorb(survivor, duplicate)
+        self._pending_merges.append(
+            (duplicate.get("id"), match, json.dumps(duplicate, default=str), json.dumps(inherited, default=str))
+        )
+        return True
+
+    def resolve(self, leads: List[dict]) -> Tuple[List[dict], dict]:
+        """
+        Index every lead not yet seen, absorbing "New" duplicates into the first
+        matching entity. Returns (surviving leads in original order, report).
+        """
+        kept: List[dict] = []
+
+        def run():
+            scanned = merged = 0
+            for lead in leads:
+                lead_id = lead.get("id")
+                if lead_id is None or lead_id in self.entities:
+                    kept.append(lead)
+                    continue
+                scanned += 1
+                if self._resolve_one(lead, keep_ref=True):
+                    merged += 1
+                else:
+                    kept.append(lead)
+            return scanned, merged
+
+        return kept, self._report(run)
+
+    def resolve_rows(self, rows: Iterable[tuple]) -> Tuple[List[str], dict]:
+        """
+        resolve() over (id, company, location, status, keyed) summary rows.
+        Keyed leads are indexed from the summary alone; the rest are loaded via
+        `fetch`. Returns (ids of absorbed leads, report).
+        """
+        absorbed: List[str] = []
+
+        def run():
+            scanned = 0
+            for lead_id, company, location, status, keyed in rows:
+                if lead_id in self.entities:
+                    continue
+                scanned += 1
+                if not keyed:
+                    lead = self.fetch(lead_id)
+                    if lead is not None and self._resolve_one(lead, keep_ref=False):
+                        absorbed.append(lead_id)
+                    continue
+                location = normalize_location(location)
+                key, name = company_keys(company, location)
+                band_keys = self._band_keys(location, shingles(key))
+                match = self._match(location, key, name, band_keys) if status == "New" else None
+                duplicate = self.fetch(lead_id) if match is not None else None
+                if duplicate is not None and self._merge(match, duplicate):
+                    absorbed.append(lead_id)
+                    continue
+                self._add(lead_id, location, key, name, band_keys)
+            return scanned, len(absorbed)
+
+        return absorbed, self._report(run)
+
+    def _report(self, run) -> dict:
+        t0 = time.time()
+        try:
+            scanned, merged = run()
+        finally:
+            self._flush()
+        self.merged_total += merged
+        return {
+            "scanned": scanned,
+            "merged": merged,
+            "entities": len(self.entities),
+            "merged_total": self.merged_total,
+            "execution_ms": round((time.time() - t0) * 1000, 1),
+        }
+
+    def _resolve_one(self, lead: dict, keep_ref: bool) -> bool:
+        """Normalize and index one unseen lead. Returns True if it was absorbed."""
+        is_new = lead.get("status", "New") == "New"
+        location = normalize_location(lead.get("location"))
+        if is_new:
+            lead["location"] = location
+            lead["role"] = normalize_role(lead.get("role"))
+        key, name = company_keys(lead.get("company"), location)
+        band_keys = self._band_keys(location, shingles(key))
+
+        match = self._match(location, key, name, band_keys) if is_new else None
+        if match is not None and self._merge(match, lead):
+            return True
+        lead["entity_key"] = f"{location.lower()}|{key}"
+        self._add(lead["id"], location, key, name, band_keys, lead if keep_ref else None)
+        return False
+
+    def unmerge(self, lead_id: str) -> Optional[dict]:
+        """
+        Undo the merge that absorbed `lead_id`: drop it from the survivor's
+        merged_ids, restore survivor fields it filled in (unless edited since) and
+        index the record as its own entity. Returns the restored record, or None
+        if no merge was recorded for it. The caller adds it back to the store.
+        """
+        if self.db_path is None:
+            return None
+        self._flush()
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT survivor_id, record, inherited FROM entity_merges WHERE lead_id=?", (lead_id,)
+        ).fetchone()
+        if row is None:
+            conn.close()
+            return None
+        conn.execute("DELETE FROM entity_merges WHERE lead_id=?", (lead_id,))
+        conn.commit()
+        conn.close()
+        survivor_id, record, inherited = row[0], json.loads(row[1]), json.loads(row[2])
+        survivor = self._lead(survivor_id)
+        if survivor is not None:
+            survivor["merged_ids"] = [i for i in survivor.get("merged_ids") or () if i != lead_id]
+            for field, previous in inherited.items():
+                if survivor.get(field) == record.get(field):
+                    survivor[field] = previous
+        location = normalize_location(record.get("location"))
+        key, name = company_keys(record.get("company"), location)
+        record["entity_key"] = f"{location.lower()}|{key}"
+        self._add(lead_id, location, key, name, self._band_keys(location, shingles(key)))
+        self._flush()
+        self.merged_total = max(0, self.merged_total - 1)
+        return record
+
+
+def _absorb(survivor: dict, duplicate: dict) -> dict:
+    """
+    Record `duplicate` on `survivor`; a still-New survivor also inherits fields it
+    lacks. Returns {field: previous survivor value} for every inherited field.
+    """
+    merged_ids = survivor.setdefault("merged_ids", [])
+    if duplicate.get("id") not in merged_ids:
+        merged_ids.append(duplicate.get("id"))
+    inherited = {}
+    if survivor.get("status") != "New":
+        return inherited
+    for field, value in duplicate.items():
+        if field in ("id", "merged_ids", "status", "entity_key"):
+            continue
+        if value not in (None, "", 0) and survivor.get(field) in (None, "", 0):
+            inherited[field] = survivor.get(field)
+            survivor[field] = value
+    return inherited
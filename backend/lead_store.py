@@ -0,0 +1,712 @@
+"""
+lead_store.py - Lazily hydrated lead collection backed by a binary snapshot
+
+Snapshot file layout (SNAPSHOT_PATH, default nexus.snap):
+
+    MAGIC "NXSNAP01" | u32 header length | header JSON | sections...
+
+The header records the lead count, byte order, status/safety vocabularies and
+the (offset, length) of each section relative to the end of the header:
+
+    ids, companies, locations   \\x1f-joined UTF-8 summary strings
+    roles, budgets              \\x1f-joined UTF-8 scoring features
+    employees                   int64 employee count per lead (500 if unset)
+    status, safety              one vocabulary code byte per lead
+    keyed                       1 if entity resolution already keyed the lead
+    icp                         int16 ICP score per lead
+    merged                      uint16 merged-duplicate count per lead
+    index                       uint64 record offsets (count + 1 entries)
+    records                     concatenated JSON lead records
+
+Opening a snapshot decodes only the summary columns and the offset index; the
+records section stays memory-mapped and a lead is parsed on first access.
+Hydrated leads are LeadRecord dicts that report their own mutations, so saves
+only journal changed rows to the `lead_journal` SQLite table. Scoring feature
+columns of journaled rows (and of every row in a snapshot written before those
+sections existed) are filled from the records the first time feature_columns()
+is called. The snapshot is
+rewritten (clean records copied as raw bytes) when the journal outgrows
+JOURNAL_COMPACT_RATIO of the store or when leads are removed.
+"""
+
+import json
+import mmap
+import os
+import sqlite3
+import struct
+import sys
+import threading
+import time
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional
+
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", "nexus.snap")
+JOURNAL_COMPACT_MIN = 256
+JOURNAL_COMPACT_RATIO = 8
+
+MAGIC = b"NXSNAP01"
+_SEP = "\x1f"
+_UNKNOWN = 255
+_DEFAULT_EMPLOYEES = 500
+
+
+class LeadRecord(dict):
+    """A hydrated lead; any top-level mutation marks its row dirty in the owning store."""
+
+    __slots__ = ("_store", "_pos")
+
+    def _mutate(self, fn, *args):
+        store = getattr(self, "_store", None)
+        if store is None:
+            return fn(self, *args)
+        with store._lock:
+            result = fn(self, *args)
+            store._touched.add(self._pos)
+            store._dirty.add(self._pos)
+            return result
+
+    def __setitem__(self, key, value):
+        self._mutate(dict.__setitem__, key, value)
+
+    def __delitem__(self, key):
+        self._mutate(dict.__delitem__, key)
+
+    def setdefault(self, key, default=None):
+        return self._mutate(dict.setdefault, key, default)
+
+    def update(self, *args, **kwargs):
+        self._mutate(lambda d: dict.update(d, *args, **kwargs))
+
+    def pop(self, key, *default):
+        return self._mutate(dict.pop, key, *default)
+
+
+def _clean(value) -> str:
+    return str(value if value is not None else "").replace(_SEP, " ")
+
+
+class LeadStore:
+    def __init__(self):
+        self.ids: List[str] = []
+        self.companies: List[str] = []
+        self.locations: List[str] = []
+        self.roles: List[str] = []
+        self.budgets: List[str] = []
+        self.employees = array("q")
+        self.status = bytearray()
+        self.safety = bytearray()
+        self.keyed = bytearray()
+        self.icp = array("h")
+        self.merged = array("H")
+        self.status_vocab: List[str] = []
+        self.safety_vocab: List[str] = []
+        self._status_codes: Dict[str, int] = {}
+        self._safety_codes: Dict[str, int] = {}
+        self._pos_by_id: Dict[str, int] = {}
+
+        self._src = array("q")                  # position -> snapshot record number, -1 if none
+        self._overrides: Dict[int, str] = {}    # position -> journaled JSON newer than the snapshot
+        self._hydrated: Dict[int, LeadRecord] = {}
+        self._touched: set = set()              # columns need refreshing from these hydrated rows
+        self._stale_features: set = set()       # roles/budgets/employees not yet read from these records
+        self._dirty: set = set()                # rows to journal on next save
+        self._restructured = False              # positions shifted; next save rewrites the snapshot
+        self._journal_rows = 0
+        self._generation = ""                   # snapshot id; journal rows from other snapshots are stale
+
+        self._lock = threading.RLock()          # every read and write of the columns, records and mmap
+        self._file = None
+        self._map: Optional[mmap.mmap] = None
+        self._records_base = 0
+        self._offsets = array("Q")
+
+    # -- construction -------------------------------------------------------
+
+    @classmethod
+    def from_list(cls, leads: Iterable[dict]) -> "LeadStore":
+        store = cls()
+        for lead in leads:
+            store.append(lead)
+        store._restructured = True
+        return store
+
+    @classmethod
+    def open(cls, snapshot_path: str, db_path: str):
+        """Load summaries + index from the snapshot and replay the journal. Returns (store, timing)."""
+        t0 = time.perf_counter()
+        store = cls()
+        timing = {}
+        if os.path.exists(snapshot_path):
+            store._map_snapshot(snapshot_path, timing)
+        t1 = time.perf_counter()
+        store._replay_journal(db_path)
+        timing["journal_ms"] = round((time.perf_counter() - t1) * 1000, 2)
+        timing["journal_rows"] = store._journal_rows
+        timing["leads"] = len(store)
+        timing["total_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+        return store, timing
+
+    def _map_snapshot(self, path: str, timing: dict):
+        t0 = time.perf_counter()
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a Nexus snapshot")
+        (header_len,) = struct.unpack_from("<I", self._map, len(MAGIC))
+        start = len(MAGIC) + 4
+        header = json.loads(self._map[start:start + header_len])
+        base = start + header_len
+        sections = header["sections"]
+        swap = header["byteorder"] != sys.byteorder
+
+        def section(name) -> bytes:
+            off, length = sections[name]
+            return self._map[base + off: base + off + length]
+
+        def strings(name) -> List[str]:
+            raw = section(name).decode("utf-8")
+            return raw.split(_SEP) if header["count"] else []
+
+        t1 = time.perf_counter()
+        timing["header_ms"] = round((t1 - t0) * 1000, 2)
+
+        n = header["count"]
+        self._generation = header["generation"]
+        self.ids = strings("ids")
+        self.companies = strings("companies")
+        self.locations = strings("locations")
+        if "roles" in sections:
+            self.roles = strings("roles")
+            self.budgets = strings("budgets")
+            self.employees.frombytes(section("employees"))
+            if swap:
+                self.employees.byteswap()
+        else:
+            self.roles = [""] * n
+            self.budgets = [""] * n
+            self.employees = array("q", [_DEFAULT_EMPLOYEES]) * n
+            self._stale_features = set(range(n))
+        self.status = bytearray(section("status"))
+        self.safety = bytearray(section("safety"))
+        self.keyed = bytearray(section("keyed"))
+        self.status_vocab = header["status_vocab"]
+        self.safety_vocab = header["safety_vocab"]
+        self._status_codes = {v: i for i, v in enumerate(self.status_vocab)}
+        self._safety_codes = {v: i for i, v in enumerate(self.safety_vocab)}
+        for col, name in ((self.icp, "icp"), (self.merged, "merged")):
+            col.frombytes(section(name))
+            if swap:
+                col.byteswap()
+        self._pos_by_id = dict(zip(self.ids, range(n)))
+        t2 = time.perf_counter()
+        timing["summaries_ms"] = round((t2 - t1) * 1000, 2)
+
+        self._offsets.frombytes(section("index"))
+        if swap:
+            self._offsets.byteswap()
+        self._records_base = base + sections["records"][0]
+        self._src = array("q", range(n))
+        timing["index_ms"] = round((time.perf_counter() - t2) * 1000, 2)
+
+    def _replay_journal(self, db_path: str):
+        _init_journal(db_path)
+        conn = sqlite3.connect(db_path)
+        rows = conn.execute(
+            "SELECT pos, lead_id, company, location, status, safety, keyed, icp, merged, record "
+            "FROM lead_journal WHERE generation=? ORDER BY pos", (self._generation,)
+        ).fetchall()
+        conn.close()
+        for pos, lead_id, company, location, status, safety, keyed, icp, merged, record in rows:
+            if pos >= len(self):
+                self._grow(pos + 1)
+            old_id = self.ids[pos]
+            if old_id and self._pos_by_id.get(old_id) == pos:
+                del self._pos_by_id[old_id]
+            self.ids[pos] = lead_id
+            self.companies[pos] = company
+            self.locations[pos] = location
+            self.status[pos] = self._code(self._status_codes, self.status_vocab, status)
+            self.safety[pos] = self._code(self._safety_codes, self.safety_vocab, safety)
+            self.keyed[pos] = keyed
+            self.icp[pos] = icp
+            self.merged[pos] = merged
+            self._pos_by_id[lead_id] = pos
+            self._overrides[pos] = record
+            self._stale_features.add(pos)
+        self._journal_rows = len(rows)
+
+    def _grow(self, size: int):
+        while len(self.ids) < size:
+            self.ids.append("")
+            self.companies.append("")
+            self.locations.append("")
+            self.roles.append("")
+            self.budgets.append("")
+            self.employees.append(_DEFAULT_EMPLOYEES)
+            self.status.append(_UNKNOWN)
+            self.safety.append(_UNKNOWN)
+            self.keyed.append(0)
+            self.icp.append(0)
+            self.merged.append(0)
+            self._src.append(-1)
+
+    # -- column maintenance -------------------------------------------------
+
+    @staticmethod
+    def _code(codes: Dict[str, int], vocab: List[str], value) -> int:
+        value = str(value)
+        code = codes.get(value)
+        if code is None:
+            if len(vocab) >= _UNKNOWN:
+                return _UNKNOWN
+            code = codes[value] = len(vocab)
+            vocab.append(value)
+        return code
+
+    def _set_columns(self, pos: int, lead: dict):
+        lead_id = str(lead.get("id", ""))
+        old_id = self.ids[pos]
+        if old_id != lead_id:
+            if self._pos_by_id.get(old_id) == pos:
+                del self._pos_by_id[old_id]
+            self._pos_by_id[lead_id] = pos
+        self.ids[pos] = lead_id
+        self.companies[pos] = _clean(lead.get("company"))
+        self.locations[pos] = _clean(lead.get("location"))
+        self._set_features(pos, lead)
+        self.status[pos] = self._code(self._status_codes, self.status_vocab, lead.get("status", ""))
+        self.safety[pos] = self._code(self._safety_codes, self.safety_vocab, lead.get("safety_check", ""))
+        self.keyed[pos] = 1 if lead.get("entity_key") else 0
+        try:
+            self.icp[pos] = max(-32768, min(32767, int(lead.get("icp_score") or 0)))
+        except (TypeError, ValueError):
+            self.icp[pos] = 0
+        self.merged[pos] = min(65535, len(lead.get("merged_ids") or ()))
+
+    def _set_features(self, pos: int, lead: dict):
+        self.roles[pos] = _clean(lead.get("role"))
+        self.budgets[pos] = _clean(lead.get("budget"))
+        try:
+            self.employees[pos] = int(lead.get("employees", _DEFAULT_EMPLOYEES))
+        except (TypeError, ValueError, OverflowError):
+            self.employees[pos] = _DEFAULT_EMPLOYEES
+        self._stale_features.discard(pos)
+
+    def _sync(self):
+        """Refresh summary columns for hydrated rows mutated since the last query."""
+        if not self._touched:
+            return
+        for pos in self._touched:
+            lead = self._hydrated.get(pos)
+            if lead is not None:
+                self._set_columns(pos, lead)
+        self._touched.clear()
+
+    # -- access -------------------------------------------------------------
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __bool__(self):
+        return bool(self.ids)
+
+    def _raw(self, pos: int):
+        """Persisted JSON for `pos`: journal text, snapshot bytes, or None if never saved. Caller holds the lock."""
+        override = self._overrides.get(pos)
+        if override is not None:
+            return override
+        src = self._src[pos]
+        if src < 0 or self._map is None:
+            return None
+        start = self._records_base + self._offsets[src]
+        end = self._records_base + self._offsets[src + 1]
+        return self._map[start:end]
+
+    def _parse(self, pos: int) -> dict:
+        raw = self._raw(pos)
+        return json.loads(raw) if raw is not None else {"id": self.ids[pos]}
+
+    def _get(self, pos: int) -> LeadRecord:
+        lead = self._hydrated.get(pos)
+        if lead is None:
+            lead = LeadRecord(self._parse(pos))
+            lead._store = self
+            lead._pos = pos
+            self._hydrated[pos] = lead
+        return lead
+
+    def get(self, pos: int) -> LeadRecord:
+        with self._lock:
+            if pos < 0:
+                pos += len(self)
+            return self._get(pos)
+
+    __getitem__ = get
+
+    def __iter__(self) -> Iterator[LeadRecord]:
+        pos = 0
+        while True:
+            with self._lock:
+                if pos >= len(self):
+                    return
+                lead = self._get(pos)
+            yield lead
+            pos += 1
+
+    def by_id(self, lead_id) -> Optional[LeadRecord]:
+        with self._lock:
+            pos = self._pos_by_id.get(lead_id)
+            return self._get(pos) if pos is not None else None
+
+    def iter_dicts(self) -> Iterator[dict]:
+        """Every lead as a dict without caching the parsed records (exports, what-if)."""
+        # Copy hydrated rows and slice raw records under the lock; parse outside it.
+        with self._lock:
+            rows = []
+            for pos in range(len(self)):
+                lead = self._hydrated.get(pos)
+                rows.append(dict(lead) if lead is not None else self._raw(pos) or {"id": self.ids[pos]})
+        for row in rows:
+            yield row if isinstance(row, dict) else json.loads(row)
+
+    def to_json(self) -> bytes:
+        """JSON array of all leads; clean rows are copied from the snapshot without parsing."""
+        parts = []
+        with self._lock:
+            for pos in range(len(self)):
+                lead = self._hydrated.get(pos)
+                if lead is not None:
+                    parts.append(json.dumps(lead, default=str).encode())
+                    continue
+                raw = self._raw(pos)
+                parts.append(raw.encode() if isinstance(raw, str) else raw if raw is not None
+                             else json.dumps({"id": self.ids[pos]}).encode())
+        return b"[" + b",".join(parts) + b"]"
+
+    def hydrated_count(self) -> int:
+        return len(self._hydrated)
+
+    # -- column queries -----------------------------------------------------
+
+    def _positions(self, status: Optional[str], safety: Optional[str]) -> Iterator[int]:
+        """Matching positions; the caller holds the lock for the whole iteration."""
+        self._sync()
+        col, value = (self.status, status) if status is not None else (self.safety, safety)
+        codes = self._status_codes if status is not None else self._safety_codes
+        code = codes.get(value)
+        if code is None:
+            return
+        needle = bytes([code])
+        pos = col.find(needle)
+        while pos != -1:
+            if safety is None or status is None or self.safety[pos] == self._safety_codes.get(safety):
+                yield pos
+            pos = col.find(needle, pos + 1)
+
+    def first(self, status: Optional[str] = None, safety: Optional[str] = None) -> Optional[LeadRecord]:
+        with self._lock:
+            for pos in self._positions(status, safety):
+                return self._get(pos)
+            return None
+
+    def select(self, status: Optional[str] = None, safety: Optional[str] = None,
+               limit: Optional[int] = None) -> List[LeadRecord]:
+        out = []
+        with self._lock:
+            for pos in self._positions(status, safety):
+                out.append(self._get(pos))
+                if limit is not None and len(out) >= limit:
+                    break
+        return out
+
+    def count(self, status: Optional[str] = None, safety: Optional[str] = None) -> int:
+        with self._lock:
+            if status is not None and safety is not None:
+                return sum(1 for _ in self._positions(status, safety))
+            self._sync()
+            col, codes, value = (
+                (self.status, self._status_codes, status) if status is not None
+                else (self.safety, self._safety_codes, safety)
+            )
+            code = codes.get(value)
+            return col.count(bytes([code])) if code is not None else 0
+
+    def score_stats(self):
+        """(number of leads with a positive ICP score, sum of those scores)."""
+        with self._lock:
+            self._sync()
+            positive = [s for s in self.icp if s > 0]
+        return len(positive), sum(positive)
+
+    def merged_total(self) -> int:
+        with self._lock:
+            self._sync()
+            return sum(self.merged)
+
+    def feature_columns(self) -> dict:
+        """
+        Copies of the columns Hunter scores on (ids, companies, roles, locations,
+        employees, budgets), so rescoring every lead parses no records. Rows
+        whose features were never read are parsed once, here.
+        """
+        with self._lock:
+            self._sync()
+            for pos in list(self._stale_features):
+                self._set_features(pos, self._parse(pos))
+            return {
+                "ids": list(self.ids),
+                "companies": list(self.companies),
+                "roles": list(self.roles),
+                "locations": list(self.locations),
+                "employees": self.employees.tolist(),
+                "budgets": list(self.budgets),
+            }
+
+    def summaries(self) -> List[tuple]:
+        """(lead_id, company, location, status, keyed) per lead, straight from the columns."""
+        with self._lock:
+            self._sync()
+            vocab = self.status_vocab
+            out = []
+            for pos in range(len(self)):
+                code = self.status[pos]
+                status = vocab[code] if code < len(vocab) else self._parse(pos).get("status", "")
+                out.append((self.ids[pos], self.companies[pos], self.locations[pos], status, bool(self.keyed[pos])))
+            return out
+
+    # -- mutation -----------------------------------------------------------
+
+    def append(self, lead: dict) -> LeadRecord:
+        with self._lock:
+            pos = len(self)
+            self._grow(pos + 1)
+            record = lead if isinstance(lead, LeadRecord) else LeadRecord(lead)
+            record._store = self
+            record._pos = pos
+            self._hydrated[pos] = record
+            self._set_columns(pos, record)
+            self._dirty.add(pos)
+            return record
+
+    def remove_ids(self, lead_ids) -> int:
+        """Drop leads by id. Positions shift, so the next save rewrites the snapshot."""
+        with self._lock:
+            return self._remove_ids(lead_ids)
+
+    def _remove_ids(self, lead_ids) -> int:
+        drop = {self._pos_by_id[i] for i in lead_ids if i in self._pos_by_id}
+        if not drop:
+            return 0
+        self._sync()
+        keep = [p for p in range(len(self)) if p not in drop]
+        remap = {old: new for new, old in enumerate(keep)}
+        self.ids = [self.ids[p] for p in keep]
+        self.companies = [self.companies[p] for p in keep]
+        self.locations = [self.locations[p] for p in keep]
+        self.roles = [self.roles[p] for p in keep]
+        self.budgets = [self.budgets[p] for p in keep]
+        self.employees = array("q", (self.employees[p] for p in keep))
+        self._stale_features = {remap[p] for p in self._stale_features if p in remap}
+        self.status = bytearray(self.status[p] for p in keep)
+        self.safety = bytearray(self.safety[p] for p in keep)
+        self.keyed = bytearray(self.keyed[p] for p in keep)
+        self.icp = array("h", (self.icp[p] for p in keep))
+        self.merged = array("H", (self.merged[p] for p in keep))
+        self._src = array("q", (self._src[p] for p in keep))
+        self._overrides = {remap[p]: raw for p, raw in self._overrides.items() if p in remap}
+        hydrated = {}
+        for p, lead in self._hydrated.items():
+            if p in remap:
+                lead._pos = remap[p]
+                hydrated[remap[p]] = lead
+            else:
+                lead._store = None
+        self._hydrated = hydrated
+        self._pos_by_id = dict(zip(self.ids, range(len(self.ids))))
+        self._dirty = {remap[p] for p in self._dirty if p in remap}
+        self._restructured = True
+        return len(drop)
+
+    # -- persistence --------------------------------------------------------
+
+    def save(self, snapshot_path: str, db_path: str) -> str:
+        """Journal dirty rows, or rewrite the snapshot when due. Returns "journal", "snapshot" or "clean"."""
+        with self._lock:
+            return self._save(snapshot_path, db_path)
+
+    def _save(self, snapshot_path: str, db_path: str) -> str:
+        self._sync()
+        threshold = max(JOURNAL_COMPACT_MIN, len(self) // JOURNAL_COMPACT_RATIO)
+        if self._restructured or not os.path.exists(snapshot_path) \
+                or self._journal_rows + len(self._dirty) > threshold:
+            self._write_snapshot(snapshot_path, db_path)
+            return "snapshot"
+        if not self._dirty:
+            return "clean"
+        rows = []
+        for pos in sorted(self._dirty):
+            lead = self._hydrated.get(pos)
+            if lead is None:
+                continue
+            record = json.dumps(lead, default=str)
+            self._overrides[pos] = record
+            rows.append((
+                pos, self.ids[pos], self.companies[pos], self.locations[pos],
+                lead.get("status", ""), lead.get("safety_check", ""),
+                self.keyed[pos], self.icp[pos], self.merged[pos], record, self._generation,
+            ))
+        conn = sqlite3.connect(db_path)
+        conn.executemany("INSERT OR REPLACE INTO lead_journal VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        conn.commit()
+        self._journal_rows = conn.execute("SELECT COUNT(*) FROM lead_journal").fetchone()[0]
+        conn.close()
+        self._dirty.clear()
+        return "journal"
+
+    def write_snapshot(self, snapshot_path: str, db_path: str):
+        with self._lock:
+            self._write_snapshot(snapshot_path, db_path)
+
+    def _write_snapshot(self, snapshot_path: str, db_path: str):
+        self._sync()
+        n = len(self)
+        offsets = array("Q", [0])
+        records = bytearray()
+        for pos in range(n):
+            lead = self._hydrated.get(pos)
+            if lead is not None:
+                raw = json.dumps(lead, default=str).encode()
+                if pos in self._stale_features:
+                    self._set_features(pos, lead)
+            else:
+                raw = self._raw(pos)
+                if raw is None:
+                    raw = json.dumps({"id": self.ids[pos]}).encode()
+                elif isinstance(raw, str):
+                    raw = raw.encode()
+                if pos in self._stale_features:
+                    self._set_features(pos, json.loads(raw))
+            records += raw
+            offsets.append(len(records))
+
+        sections = []
+
+        def add(name, data):
+            sections.append((name, bytes(data)))
+
+        add("ids", _SEP.join(self.ids).encode())
+        add("companies", _SEP.join(self.companies).encode())
+        add("locations", _SEP.join(self.locations).encode())
+        add("roles", _SEP.join(self.roles).encode())
+        add("budgets", _SEP.join(self.budgets).encode())
+        add("employees", self.employees.tobytes())
+        add("status", self.status)
+        add("safety", self.safety)
+        add("keyed", self.keyed)
+        add("icp", self.icp.tobytes())
+        add("merged", self.merged.tobytes())
+        add("index", offsets.tobytes())
+        add("records", records)
+
+        layout, off = {}, 0
+        for name, data in sections:
+            layout[name] = [off, len(data)]
+            off += len(data)
+        generation = f"{time.time_ns():x}"
+        header = json.dumps({
+            "version": 1,
+            "generation": generation,
+            "count": n,
+            "byteorder": sys.byteorder,
+            "created_at": time.time(),
+            "status_vocab": self.status_vocab,
+            "safety_vocab": self.safety_vocab,
+            "sections": layout,
+        }).encode()
+
+        tmp = snapshot_path + ".tmp"
+        with open(tmp, "wb") as fh:
+            fh.write(MAGIC)
+            fh.write(struct.pack("<I", len(header)))
+            fh.write(header)
+            for _, data in sections:
+                fh.write(data)
+            fh.flush()
+            os.fsync(fh.fileno())
+
+        # Journal rows are tagged with the snapshot generation, so a crash between
+        # the replace and the DELETE below cannot replay them onto the new layout.
+        self._close_map()
+        os.replace(tmp, snapshot_path)
+        self._generation = generation
+        _init_journal(db_path)
+        conn = sqlite3.connect(db_path)
+        conn.execute("DELETE FROM lead_journal")
+        conn.commit()
+        conn.close()
+
+        self._map_records(snapshot_path)
+        self._src = array("q", range(n))
+        self._overrides.clear()
+        self._dirty.clear()
+        self._journal_rows = 0
+        self._restructured = False
+
+    def _map_records(self, path: str):
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        (header_len,) = struct.unpack_from("<I", self._map, len(MAGIC))
+        start = len(MAGIC) + 4
+        header = json.loads(self._map[start:start + header_len])
+        base = start + header_len
+        off, length = header["sections"]["index"]
+        self._offsets = array("Q")
+        self._offsets.frombytes(self._map[base + off: base + off + length])
+        if header["byteorder"] != sys.byteorder:
+            self._offsets.byteswap()
+        self._records_base = base + header["sections"]["records"][0]
+
+    def _close_map(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def close(self):
+        with self._lock:
+            self._close_map()
+
+
+def _init_journal(db_path: str):
+    conn = sqlite3.connect(db_path)
+    conn.execute("""CREATE TABLE IF NOT EXISTS lead_journal (
+        pos INTEGER PRIMARY KEY,
+        lead_id TEXT NOT NULL,
+        company TEXT,
+        location TEXT,
+        status TEXT,
+        safety TEXT,
+        keyed INTEGER,
+        icp INTEGER,
+        merged INTEGER,
+        record TEXT NOT NULL,
+        generation TEXT NOT NULL
+    )""")
+    conn.commit()
+    conn.close()
+
+
+def clear_persisted(snapshot_path: str, db_path: str):
+    """Remove the snapshot file and journal rows (used by /api/reset)."""
+    try:
+        os.remove(snapshot_path)
+    except OSError:
+        pass
+    if os.path.exists(db_path):
+        _init_journal(db_path)
+        conn = sqlite3.connect(db_path)
+        conn.execute("DELETE FROM lead_journal")
+        conn.commit()
+        conn.close()
@@ -3,32 +3,48 @@ main.py - Nexus AI FastAPI Backend
 
 ENDPOINTS
 ---------
-GET  /health                -> Server health, uptime, Gemini status
+GET  /health                -> Server health, uptime, Gemini status, startup timing
 GET  /api/status            -> Dashboard metrics
 GET  /api/leads             -> All leads with full data
 GET  /api/logs              -> Recent log entries (REST fallback)
-GET  /api/audit             -> Full agent audit trail
+GET  /api/audit             -> Agent audit trail (tail by default; seq/time/target range queries stream)
 GET  /api/analytics         -> Pipeline analytics, ICP scores, RAG hit rate
 POST /api/config            -> Save Gemini API key
-POST /api/upload            -> Upload and index PDF knowledge base (max 10MB)
+POST /api/upload            -> Upload PDF knowledge base and build its vector index (max 10MB)
 POST /api/run-swarm         -> Execute one agent step (Hunter->Guardian->Professor->Closer)
+POST /api/dedup             -> Merge duplicate New leads and report merge counts
+POST /api/dedup/unmerge/{id} -> Undo a merge, restoring the absorbed lead
+GET  /api/crm/status        -> CRM outbox counts and adapter
+POST /api/crm/flush         -> Retry due CRM upserts now (optionally re-arming dead ones)
 POST /api/reset             -> Reset all state and clear DB
+GET  /api/rules             -> Active Hunter/Guardian scoring rules
+POST /api/rules/reload      -> Force a reload of the scoring rules file
+POST /api/rules/what-if     -> Rescore all leads under candidate rules (read-only)
+GET  /api/admin/profiling   -> Profiler status (sampling / tracing / memory)
+POST /api/admin/profiling   -> Toggle profilers at runtime
+POST /api/admin/profiling/reset      -> Drop collected samples, traces and memory baseline
+GET  /api/admin/profiling/traces     -> Recent per-request span traces
+GET  /api/admin/profiling/memory     -> tracemalloc top allocation sites (optionally as a diff)
+GET  /api/admin/profiling/flamegraph -> Download collapsed stacks (samples | spans | memory)
 GET  /api/export/csv        -> Download leads as CSV
-GET  /api/export/audit      -> Download audit trail as JSON
+GET  /api/export/audit      -> Download full audit trail as JSON (streamed)
 WS   /ws/logs               -> WebSocket real-time log streaming
 """
 
 import asyncio
 import csv
 import io
+import itertools
 import json
 import os
 import random
 import re
+import secrets
 import sqlite3
+import threading
 import time
 from datetime import datetime
-from typing import Set
+from typing import Optional, Set
 
 START_TIME = time.time()
 
@@ -37,11 +53,20 @@ load_dotenv()
 
 import PyPDF2
 import google.generativeai as genai
-from fastapi import FastAPI, File, HTTPException, UploadFile, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, File, Header, HTTPException, UploadFile, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 
+import crm_sync
+import retrieval
+import scoring_rules
+from audit_log import AuditLog
+from crm_sync import SyncEngine
+from entity_resolution import EntityIndex
+from lead_store import SNAPSHOT_PATH, LeadStore, clear_persisted
+from profiling import Profiler, TraceMiddleware
+
 # ---------------------------------------------------------------------------
 # APP SETUP
 # ---------------------------------------------------------------------------
@@ -55,8 +80,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Audit-Truncated", "X-Next-Since-Seq"],
 )
 
+profiler = Profiler()
+app.add_middleware(TraceMiddleware, profiler=profiler)
+
 
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
@@ -108,12 +137,14 @@ def _initial_leads():
 
 
 state = {
-    "leads":          _initial_leads(),
+    "leads":          LeadStore.from_list(_initial_leads()),
     "logs":           [],
     "pdf_text":       "",
+    "rag_index":      None,
     "gemini_api_key": os.getenv("GEMINI_API_KEY", ""),
-    "audit_trail":    [],
     "mode":           "Simulation",
+    "dedup":          None,
+    "startup_timing": {},
 }
 
 # ---------------------------------------------------------------------------
@@ -122,6 +153,10 @@ state = {
 
 DB_PATH = "nexus.db"
 
+audit_log = AuditLog(DB_PATH)
+crm_sync_engine = SyncEngine(DB_PATH)
+entity_index = EntityIndex(fetch=lambda lead_id: state["leads"].by_id(lead_id), db_path=DB_PATH)
+
 
 def init_db():
     conn = sqlite3.connect(DB_PATH)
@@ -133,31 +168,55 @@ def init_db():
     )""")
     conn.commit()
     conn.close()
+    audit_log.init()
+    crm_sync_engine.init()
+    entity_index.init()
 
 
 def save_state_to_db():
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    for key in ["leads", "logs", "audit_trail"]:
-        c.execute(
+    """Leads go to the snapshot + journal (changed rows only); logs stay an app_state blob."""
+    with profiler.span("db.save_state") as span:
+        span.set(leads=state["leads"].save(SNAPSHOT_PATH, DB_PATH))
+        conn = sqlite3.connect(DB_PATH)
+        conn.execute(
             "INSERT OR REPLACE INTO app_state (key, value, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)",
-            (key, json.dumps(state[key])),
+            ("logs", json.dumps(state["logs"])),
         )
-    conn.commit()
-    conn.close()
+        conn.commit()
+        conn.close()
 
 
 def load_state_from_db():
+    """Open the lead snapshot lazily (summaries now, records on first touch). Returns a timing breakdown."""
     if not os.path.exists(DB_PATH):
-        return False
+        return None
+    store, timing = LeadStore.open(SNAPSHOT_PATH, DB_PATH)
+    t0 = time.perf_counter()
     conn = sqlite3.connect(DB_PATH)
     c = conn.cursor()
-    for key in ["leads", "logs", "audit_trail"]:
-        row = c.execute("SELECT value FROM app_state WHERE key=?", (key,)).fetchone()
-        if row:
-            state[key] = json.loads(row[0])
+    row = c.execute("SELECT value FROM app_state WHERE key='logs'").fetchone()
+    if row:
+        state["logs"] = json.loads(row[0])
+    timing["logs_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+    # Migrate the pre-snapshot leads blob into the store once.
+    row = c.execute("SELECT value FROM app_state WHERE key='leads'").fetchone()
+    if row:
+        if not len(store):
+            store = LeadStore.from_list(json.loads(row[0]))
+            store.save(SNAPSHOT_PATH, DB_PATH)
+        c.execute("DELETE FROM app_state WHERE key='leads'")
+        conn.commit()
+    if len(store) or os.path.exists(SNAPSHOT_PATH):
+        state["leads"].close()
+        state["leads"] = store
+    # Migrate the pre-segmented audit blob into the append-only log once.
+    row = c.execute("SELECT value FROM app_state WHERE key='audit_trail'").fetchone()
+    if row:
+        audit_log.extend(json.loads(row[0]))
+        c.execute("DELETE FROM app_state WHERE key='audit_trail'")
+        conn.commit()
     conn.close()
-    return True
+    return timing
 
 # ---------------------------------------------------------------------------
 # WEBSOCKET MANAGER
@@ -212,10 +271,31 @@ def add_log(agent: str, message: str, type_: str = "info"):
 # ---------------------------------------------------------------------------
 
 
+def _traced_job(name, fn):
+    """Run a background job under its own trace so its spans are recorded like a request's."""
+    with profiler.trace(f"job.{name}"):
+        return fn()
+
+
 @app.on_event("startup")
 async def startup():
+    t0 = time.perf_counter()
     init_db()
-    load_state_from_db()
+    t1 = time.perf_counter()
+    timing = load_state_from_db() or {}
+    timing["init_db_ms"] = round((t1 - t0) * 1000, 2)
+    timing["boot_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+    state["startup_timing"] = timing
+    audit_log.compact_async()
+    # Loading the persisted entity index is still O(leads); keep it off the boot path.
+    asyncio.ensure_future(asyncio.to_thread(_traced_job, "resolve_leads", resolve_leads))
+    asyncio.ensure_future(asyncio.to_thread(_traced_job, "crm_flush", _flush_crm))
+    add_log(
+        "SYSTEM",
+        f"State loaded: {len(state['leads']):,} leads in {timing['boot_ms']}ms "
+        f"(summaries {timing.get('summaries_ms', 0)}ms, journal {timing.get('journal_ms', 0)}ms)",
+        "info",
+    )
     add_log("SYSTEM", "Nexus AI Backend online - agents ready", "info")
 
 # ---------------------------------------------------------------------------
@@ -236,56 +316,70 @@ async def websocket_logs(websocket: WebSocket):
     except Exception:
         manager.disconnect(websocket)
 
+# ---------------------------------------------------------------------------
+# ENTITY RESOLUTION
+# ---------------------------------------------------------------------------
+
+
+_dedup_lock = threading.Lock()
+
+
+def resolve_leads(blocking: bool = True):
+    """
+    Merge duplicate New leads into their first-seen entity before Hunter scores them.
+    With blocking=False (the swarm step) a resolve already running in the background
+    is left to finish instead of stalling the request.
+    """
+    if not _dedup_lock.acquire(blocking=blocking):
+        return state["dedup"]
+    try:
+        if not entity_index.loaded:
+            with profiler.span("dedup.load"):
+                entity_index.load()
+        leads = state["leads"]
+        # Only New leads can be absorbed, so there is nothing to index for until one exists.
+        if len(entity_index) == len(leads) or not leads.count(status="New"):
+            return state["dedup"]
+        with profiler.span("dedup.resolve"):
+            merged_ids, report = entity_index.resolve_rows(leads.summaries())
+        leads.remove_ids(merged_ids)
+        state["dedup"] = report
+        if report["merged"]:
+            add_log("HUNTER", f"Entity resolution: merged {report['merged']} duplicate lead(s) | {report['entities']} unique entities", "hunter")
+            save_state_to_db()
+        return report
+    finally:
+        _dedup_lock.release()
+
 # ---------------------------------------------------------------------------
 # AGENT: HUNTER
 # ---------------------------------------------------------------------------
 
 
+rules_store = scoring_rules.RulesStore()
+
+
 def run_hunter():
-    for lead in state["leads"]:
-        if lead["status"] == "New":
-            role_weights = {
-                "CISO": 100, "CTO": 95, "IT Director": 80,
-                "VP Engineering": 85, "Security Manager": 70,
-            }
-            role_score = role_weights.get(lead["role"], 60)
-
-            location_weights = {
-                "Hyderabad": 100, "Visakhapatnam": 88, "Vijayawada": 78,
-                "Andhra Pradesh": 72, "Chennai": 85, "Bengaluru": 95,
-            }
-            loc_score = location_weights.get(lead["location"], 65)
-
-            emp = lead.get("employees", 500)
-            if emp >= 2000:   emp_score = 100
-            elif emp >= 1000: emp_score = 85
-            elif emp >= 500:  emp_score = 70
-            else:             emp_score = 55
-
-            budget_num = int(re.sub(r"[^\d]", "", str(lead.get("budget", "0"))) or "0")
-            if budget_num >= 400:   budget_score = 100
-            elif budget_num >= 200: budget_score = 85
-            elif budget_num >= 100: budget_score = 70
-            else:                   budget_score = 55
-
-            icp_score = round(
-                0.3 * role_score + 0.3 * loc_score +
-                0.2 * emp_score + 0.2 * budget_score
-            )
-            breakdown = (
-                f"Role:{role_score} | Loc:{loc_score} | "
-                f"Emp:{emp_score} | Budget:{budget_score} -> ICP:{icp_score}"
-            )
+    lead = state["leads"].first(status="New")
+    if lead is None:
+        return None
 
-            lead["icp_score"] = icp_score
-            lead["score_breakdown"] = breakdown
-            lead["status"] = "Scored"
-            lead["last_log"] = f"ICP Score: {icp_score}%"
+    rules = rules_store.get()
+    role_score, loc_score, emp_score, budget_score = rules.components(lead)
+    icp_score = rules.blend(role_score, loc_score, emp_score, budget_score)
+    breakdown = (
+        f"Role:{role_score} | Loc:{loc_score} | "
+        f"Emp:{emp_score} | Budget:{budget_score} -> ICP:{icp_score}"
+    )
 
-            add_log("HUNTER", f"Scored {lead['company']} [{lead['location']}] - ICP {icp_score}% | {breakdown}", "hunter")
-            save_state_to_db()
-            return {"agent": "hunter", "lead": lead["company"], "score": icp_score}
-    return None
+    lead["icp_score"] = icp_score
+    lead["score_breakdown"] = breakdown
+    lead["status"] = "Scored"
+    lead["last_log"] = f"ICP Score: {icp_score}%"
+
+    add_log("HUNTER", f"Scored {lead['company']} [{lead['location']}] - ICP {icp_score}% | {breakdown}", "hunter")
+    save_state_to_db()
+    return {"agent": "hunter", "lead": lead["company"], "score": icp_score}
 
 # ---------------------------------------------------------------------------
 # AGENT: GUARDIAN
@@ -293,74 +387,74 @@ def run_hunter():
 
 
 def run_guardian():
-    for lead in state["leads"]:
-        if lead["status"] == "Scored" and lead["safety_check"] == "Pending":
-            checks = []
-            passed = 0
-
-            # CHECK 1: PII Scan
-            lead_str = str(lead)
-            pii_patterns = [
-                r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
-                r'\b\d{10}\b',
-                r'\b\d{12}\b',
-                r'\b[0-9]{16}\b',
-            ]
-            pii_found = any(re.search(p, lead_str) for p in pii_patterns)
-            ok = not pii_found
-            checks.append({"check": "PII Scan", "passed": ok, "detail": "No PII" if ok else "PII FOUND"})
-            if ok: passed += 1
-
-            # CHECK 2: Score bias
-            all_scores = [l["icp_score"] for l in state["leads"] if l["icp_score"] > 0]
-            avg = sum(all_scores) / len(all_scores) if all_scores else 0
-            ok = abs(lead["icp_score"] - avg) < 40
-            checks.append({"check": "Bias Check", "passed": ok, "detail": f"Score {lead['icp_score']} vs avg {avg:.0f}"})
-            if ok: passed += 1
-
-            # CHECK 3: Location whitelist
-            allowed = ["Hyderabad", "Visakhapatnam", "Vijayawada", "Chennai", "Bengaluru", "Andhra Pradesh"]
-            ok = lead["location"] in allowed
-            checks.append({"check": "Location Whitelist", "passed": ok, "detail": lead["location"]})
-            if ok: passed += 1
-
-            # CHECK 4: Budget sanity
-            budget_num = int(re.sub(r"[^\d]", "", str(lead.get("budget", "0"))) or "0")
-            ok = 50 <= budget_num <= 600
-            checks.append({"check": "Budget Sanity", "passed": ok, "detail": f"{budget_num}L"})
-            if ok: passed += 1
-
-            # CHECK 5: Role authority
-            senior = ["CISO", "CTO", "VP Engineering", "IT Director", "Security Manager", "CEO", "COO"]
-            ok = lead["role"] in senior
-            checks.append({"check": "Role Authority", "passed": ok, "detail": lead["role"]})
-            if ok: passed += 1
-
-            result = "Passed" if passed >= 4 else "Failed"
-            lead["safety_check"] = result
-            if result == "Passed":
-                lead["status"] = "Nurtured"
-                lead["last_log"] = f"Guardian: {passed}/5 checks passed"
-            else:
-                lead["last_log"] = f"Guardian: only {passed}/5 checks passed"
-
-            bias_score = round(abs(lead["icp_score"] - avg), 1)
-            lead["audit_report"] = {
-                "checks": checks, "passed": passed, "total": 5,
-                "bias_score": bias_score, "timestamp": datetime.now().isoformat(),
-            }
-
-            add_log("GUARDIAN", f"Compliance Audit: {lead['company']} | {passed}/5 checks | Bias:{bias_score} | {result.upper()}", "guardian")
-            state["audit_trail"].append({
-                "time": datetime.now().isoformat(),
-                "agent": "Guardian",
-                "action": f"Compliance {result}",
-                "target": lead["company"],
-                "detail": f"{passed}/5, bias:{bias_score}",
-            })
-            save_state_to_db()
-            return {"agent": "guardian", "lead": lead["company"], "status": result}
-    return None
+    lead = state["leads"].first(status="Scored", safety="Pending")
+    if lead is None:
+        return None
+
+    rules = rules_store.get()
+    checks = []
+    passed = 0
+
+    # CHECK 1: PII Scan
+    lead_str = str(lead)
+    pii_patterns = [
+        r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
+        r'\b\d{10}\b',
+        r'\b\d{12}\b',
+        r'\b[0-9]{16}\b',
+    ]
+    pii_found = any(re.search(p, lead_str) for p in pii_patterns)
+    ok = not pii_found
+    checks.append({"check": "PII Scan", "passed": ok, "detail": "No PII" if ok else "PII FOUND"})
+    if ok: passed += 1
+
+    # CHECK 2: Score bias
+    scored, score_sum = state["leads"].score_stats()
+    avg = score_sum / scored if scored else 0
+    ok = abs(lead["icp_score"] - avg) < rules.bias_tolerance
+    checks.append({"check": "Bias Check", "passed": ok, "detail": f"Score {lead['icp_score']} vs avg {avg:.0f}"})
+    if ok: passed += 1
+
+    # CHECK 3: Location whitelist
+    ok = lead["location"] in rules.allowed_locations
+    checks.append({"check": "Location Whitelist", "passed": ok, "detail": lead["location"]})
+    if ok: passed += 1
+
+    # CHECK 4: Budget sanity
+    budget_num = scoring_rules.parse_budget(lead.get("budget", "0"))
+    ok = rules.budget_min <= budget_num <= rules.budget_max
+    checks.append({"check": "Budget Sanity", "passed": ok, "detail": f"{budget_num}L"})
+    if ok: passed += 1
+
+    # CHECK 5: Role authority
+    ok = lead["role"] in rules.senior_roles
+    checks.append({"check": "Role Authority", "passed": ok, "detail": lead["role"]})
+    if ok: passed += 1
+
+    result = "Passed" if passed >= rules.min_checks_passed else "Failed"
+    lead["safety_check"] = result
+    if result == "Passed":
+        lead["status"] = "Nurtured"
+        lead["last_log"] = f"Guardian: {passed}/5 checks passed"
+    else:
+        lead["last_log"] = f"Guardian: only {passed}/5 checks passed"
+
+    bias_score = round(abs(lead["icp_score"] - avg), 1)
+    lead["audit_report"] = {
+        "checks": checks, "passed": passed, "total": 5,
+        "bias_score": bias_score, "timestamp": datetime.now().isoformat(),
+    }
+
+    add_log("GUARDIAN", f"Compliance Audit: {lead['company']} | {passed}/5 checks | Bias:{bias_score} | {result.upper()}", "guardian")
+    audit_log.append({
+        "time": datetime.now().isoformat(),
+        "agent": "Guardian",
+        "action": f"Compliance {result}",
+        "target": lead["company"],
+        "detail": f"{passed}/5, bias:{bias_score}",
+    })
+    save_state_to_db()
+    return {"agent": "guardian", "lead": lead["company"], "status": result}
 
 # ---------------------------------------------------------------------------
 # AGENT: PROFESSOR
@@ -368,11 +462,10 @@ def run_guardian():
 
 
 def run_professor():
-    ready = [l for l in state["leads"] if l["status"] == "Scored" and l["safety_check"] == "Passed"]
-    if not ready:
+    lead = state["leads"].first(status="Scored", safety="Passed")
+    if lead is None:
         return None
 
-    lead = ready[0]
     loc = (lead.get("location") or "").strip()
     if not loc:
         add_log("PROFESSOR", f"Skipping lead with empty location: {lead.get('company', '?')}", "error")
@@ -380,13 +473,28 @@ def run_professor():
 
     pdf_text = state["pdf_text"] or ""
 
-    # RAG context lookup
+    # RAG context lookup: semantic top-k first, exact location match as fallback
     context = "General Cyber Security"
     rag_status = "RAG MISS"
-    if loc and loc in pdf_text:
+    rag_mode = "none"
+    rag_quality = 0.0
+    index = state["rag_index"]
+    if index is not None:
+        with profiler.span("rag.search", passages=len(index)):
+            hits = index.search(
+                retrieval.expand_query(loc, lead.get("role", "")), k=3, anchor=retrieval.location_terms(loc)
+            )
+        rag_quality = max((score for score, _ in hits), default=0.0)
+        passages = [p for score, p in hits if score >= retrieval.MIN_HIT_SCORE]
+        if passages:
+            context = " ".join(passages)[:600]
+            rag_status = "RAG HIT"
+            rag_mode = "semantic"
+    if rag_status == "RAG MISS" and loc in pdf_text:
         start = pdf_text.find(loc)
         context = pdf_text[start: start + 300]
         rag_status = "RAG HIT"
+        rag_mode = "exact"
 
     # Subject generation
     subject = ""
@@ -399,7 +507,8 @@ def run_professor():
                 f"Write a 4-word urgent email subject for a {lead['role']} in {loc}. "
                 "Tone: Professional Security Alert."
             )
-            subject = model.generate_content(prompt).text.strip()
+            with profiler.span("llm.subject"):
+                subject = model.generate_content(prompt).text.strip()
         except Exception as e:
             add_log("PROFESSOR", f"Gemini error: {str(e)[:60]}. Using simulation.", "error")
             subject = f"Urgent: {loc} Cyber Security Update"
@@ -425,7 +534,8 @@ def run_professor():
                 "P1: location-specific cyber threat. P2: NexusAI solution. P3: 15-min demo CTA. "
                 "Return ONLY the body, no subject/greeting/signature."
             )
-            email_body = genai.GenerativeModel("gemini-1.5-flash").generate_content(body_prompt).text.strip()
+            with profiler.span("llm.body"):
+                email_body = genai.GenerativeModel("gemini-1.5-flash").generate_content(body_prompt).text.strip()
         except Exception:
             email_body = _fallback_body(lead, loc)
     else:
@@ -436,8 +546,8 @@ def run_professor():
     lead["email_body"] = email_body
     lead["email_generated_at"] = datetime.now().isoformat()
 
-    add_log("PROFESSOR", f"{rag_status} | Email for {lead['company']}: \"{subject}\"", "professor")
-    state["audit_trail"].append({
+    add_log("PROFESSOR", f"{rag_status} ({rag_mode}, q={rag_quality:.2f}) | Email for {lead['company']}: \"{subject}\"", "professor")
+    audit_log.append({
         "time": _now(), "agent": "Professor",
         "action": "Content Gen", "target": lead["company"],
     })
@@ -488,24 +598,53 @@ def _fallback_body(lead, loc):
 # ---------------------------------------------------------------------------
 
 
+def _apply_crm_report(report):
+    """Copy outbox results back onto the leads and the audit trail."""
+    if not report["synced"] and not report["failures"]:
+        return
+    for lead, item in crm_sync.apply_report(report, state["leads"].by_id):
+        audit_log.append({
+            "time": _now(), "agent": "Closer",
+            "action": "CRM Sync", "target": lead.get("company", "Unknown"),
+            "detail": f"{item['crm_id']} ({item['status']})",
+        })
+    if report["sent"]:
+        add_log("CLOSER", f"Opportunity! {report['sent']} lead(s) synced to {crm_sync_engine.adapter.name} "
+                          f"in {report['batches']} batch(es), {report['execution_ms']}ms", "closer")
+    if report["failed"]:
+        add_log("CLOSER", f"{report['failed']} CRM upsert(s) failed ({report['dead']} dead) - queued for retry", "error")
+
+
+def _flush_crm():
+    with profiler.span("crm.flush") as span:
+        report = crm_sync_engine.flush()
+        span.set(sent=report["sent"], failed=report["failed"])
+    _apply_crm_report(report)
+    if report["sent"] or report["failed"]:
+        save_state_to_db()
+    return report
+
+
 def run_closer():
-    nurtured = [l for l in state["leads"] if l["status"] == "Nurtured"]
-    if not nurtured:
+    batch = state["leads"].select(
+        status="Nurtured", limit=crm_sync_engine.batch_size * crm_sync_engine.concurrency
+    )
+    if not batch:
+        # Nothing new to close; use the step to drain outbox retries, if any are due.
+        report = _flush_crm()
+        if report["sent"] or report["failed"]:
+            return {"agent": "closer", "synced": report["sent"], "failed": report["failed"]}
         return None
-    lead = nurtured[0]
     try:
-        lead["status"] = "Opportunity"
-        company = lead.get("company", "Unknown")
-        add_log("CLOSER", f"Opportunity! {company} synced to Salesforce.", "closer")
-        try:
-            state["audit_trail"].append({
-                "time": _now(), "agent": "Closer",
-                "action": "CRM Sync", "target": company,
-            })
-        except Exception:
-            pass
+        with profiler.span("db.crm_enqueue", leads=len(batch)):
+            crm_sync_engine.enqueue(batch)
+        for lead in batch:
+            lead["status"] = "Opportunity"
+            lead["crm_sync"] = "Pending"
+        report = _flush_crm()
         save_state_to_db()
-        return {"agent": "closer", "lead": company}
+        return {"agent": "closer", "lead": batch[0].get("company", "Unknown"),
+                "queued": len(batch), "synced": report["sent"]}
     except Exception as e:
         add_log("CLOSER", f"Closer error: {str(e)[:60]}", "error")
         return None
@@ -517,14 +656,13 @@ def run_closer():
 
 def _run_swarm_step():
     """Execute exactly one agent step in priority order."""
-    if run_hunter() is not None:
-        return
-    if run_guardian() is not None:
-        return
-    if run_professor() is not None:
-        return
-    if run_closer() is not None:
-        return
+    resolve_leads(blocking=False)
+    for name, agent in (("hunter", run_hunter), ("guardian", run_guardian),
+                        ("professor", run_professor), ("closer", run_closer)):
+        with profiler.span(f"agent.{name}"):
+            result = agent()
+        if result is not None:
+            return
     add_log("SYSTEM", "All leads processed. Pipeline complete.", "info")
 
 # ---------------------------------------------------------------------------
@@ -536,6 +674,17 @@ class ConfigModel(BaseModel):
     gemini_api_key: str
 
 
+class WhatIfModel(BaseModel):
+    hunter: dict = {}
+
+
+class ProfilingModel(BaseModel):
+    sampling: Optional[bool] = None
+    tracing: Optional[bool] = None
+    memory: Optional[bool] = None
+    interval_ms: Optional[float] = None
+
+
 @app.get("/health")
 def health_check():
     uptime_seconds = int(time.time() - START_TIME)
@@ -558,43 +707,48 @@ def health_check():
         "gemini_model": "gemini-1.5-flash",
         "pdf_loaded": bool(state["pdf_text"]),
         "pdf_chars": len(state["pdf_text"]),
+        "rag_passages": len(state["rag_index"]) if state["rag_index"] else 0,
         "leads_total": len(state["leads"]),
+        "leads_hydrated": state["leads"].hydrated_count(),
+        "startup_timing": state["startup_timing"],
         "websocket_clients": len(manager.active_connections),
     }
 
 
 @app.get("/api/analytics")
 def get_analytics():
-    scored = [l for l in state["leads"] if l["icp_score"] > 0]
-    avg_icp = round(sum(l["icp_score"] for l in scored) / len(scored), 1) if scored else 0
+    leads = state["leads"]
+    scored, score_sum = leads.score_stats()
+    avg_icp = round(score_sum / scored, 1) if scored else 0
     rag_hits  = sum(1 for e in state["logs"] if "RAG HIT"  in e.get("message", ""))
-    rag_total = sum(1 for e in state["logs"] if "RAG"      in e.get("message", ""))
+    rag_total = rag_hits + sum(1 for e in state["logs"] if "RAG MISS" in e.get("message", ""))
     rag_hit_rate = round(rag_hits / rag_total * 100, 1) if rag_total > 0 else 0
     return {
         "pipeline_stages": {
-            "New":         sum(1 for l in state["leads"] if l["status"] == "New"),
-            "Scored":      sum(1 for l in state["leads"] if l["status"] == "Scored"),
-            "Nurtured":    sum(1 for l in state["leads"] if l["status"] == "Nurtured"),
-            "Opportunity": sum(1 for l in state["leads"] if l["status"] == "Opportunity"),
+            "New":         leads.count(status="New"),
+            "Scored":      leads.count(status="Scored"),
+            "Nurtured":    leads.count(status="Nurtured"),
+            "Opportunity": leads.count(status="Opportunity"),
         },
         "avg_icp_score":  avg_icp,
         "icp_match_rate": avg_icp if avg_icp > 0 else 87,
         "rag_hit_rate":   rag_hit_rate,
         "roi_multiplier": round(1 + (avg_icp / 100) * 4.2, 1) if avg_icp > 0 else 4.2,
         "total_logs":     len(state["logs"]),
-        "audit_entries":  len(state["audit_trail"]),
+        "audit_entries":  audit_log.count(),
+        "duplicates_merged": leads.merged_total(),
     }
 
 
 @app.get("/api/status")
 def get_status():
+    leads = state["leads"]
     compliance_rate = round(
-        sum(1 for l in state["leads"] if l["safety_check"] == "Passed") /
-        len(state["leads"]) * 100
-    ) if state["leads"] else 0
+        leads.count(safety="Passed") / len(leads) * 100
+    ) if leads else 0
     return {
-        "total_leads":     len(state["leads"]),
-        "opportunities":   sum(1 for l in state["leads"] if l["status"] == "Opportunity"),
+        "total_leads":     len(leads),
+        "opportunities":   leads.count(status="Opportunity"),
         "compliance_rate": compliance_rate,
         "pdf_loaded":      bool(state["pdf_text"]),
         "pdf_chars":       len(state["pdf_text"]),
@@ -606,7 +760,8 @@ def get_status():
 
 @app.get("/api/leads")
 def get_leads():
-    return state["leads"]
+    # Untouched leads are served as their stored JSON bytes, without hydrating them.
+    return Response(content=state["leads"].to_json(), media_type="application/json")
 
 
 @app.get("/api/logs")
@@ -614,9 +769,79 @@ def get_logs():
     return state["logs"][:50]
 
 
+def _stream_json_array(items):
+    yield "["
+    first = True
+    for item in items:
+        yield ("" if first else ",") + json.dumps(item, default=str)
+        first = False
+    yield "]"
+
+
 @app.get("/api/audit")
-def get_audit():
-    return state["audit_trail"]
+def get_audit(
+    limit: int = 200,
+    since_seq: Optional[int] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    target: Optional[str] = None,
+):
+    """
+    Without filters returns the newest `limit` entries; with filters returns the
+    first `limit` matches after `since_seq`. Both are in ascending seq order.
+    X-Audit-Truncated says whether more matches exist, and X-Next-Since-Seq is
+    the cursor to pass as `since_seq` to read on (or poll for new entries).
+    """
+    limit = max(0, min(limit, 10000))
+    if since_seq is None and start is None and end is None and target is None:
+        entries = audit_log.tail(limit)
+        truncated = audit_log.count() > len(entries)
+    else:
+        try:
+            entries = list(itertools.islice(
+                audit_log.query(since_seq=since_seq, start=start, end=end, target=target, limit=limit + 1),
+                limit + 1,
+            ))
+        except FileNotFoundError as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        truncated = len(entries) > limit
+        entries = entries[:limit]
+    cursor = entries[-1]["seq"] if entries else (since_seq if since_seq is not None else audit_log.count())
+    return JSONResponse(
+        content=entries,
+        headers={"X-Audit-Truncated": "true" if truncated else "false", "X-Next-Since-Seq": str(cursor)},
+    )
+
+
+@app.get("/api/rules")
+def get_rules():
+    rules_store.get()
+    return rules_store.info()
+
+
+@app.post("/api/rules/reload")
+def post_rules_reload():
+    rules = rules_store.reload()
+    if rules_store.error:
+        add_log("SYSTEM", f"Scoring rules reload failed: {rules_store.error[:60]}", "error")
+    else:
+        add_log("SYSTEM", f"Scoring rules v{rules.version} loaded from {rules_store.source}", "info")
+    return rules_store.info()
+
+
+@app.post("/api/rules/what-if")
+def post_rules_what_if(body: WhatIfModel):
+    current = rules_store.get()
+    try:
+        candidate = scoring_rules.compile_rules(scoring_rules.merge_rules(current.raw, {"hunter": body.hunter}))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e)[:200])
+    t0 = time.time()
+    columns = scoring_rules.LeadColumns.from_columns(state["leads"].feature_columns())
+    report = scoring_rules.what_if(columns, current, candidate)
+    report["execution_ms"] = round((time.time() - t0) * 1000, 2)
+    report["rules_version"] = current.version
+    return report
 
 
 @app.post("/api/config")
@@ -655,14 +880,25 @@ async def upload_pdf(file: UploadFile = File(...)):
         if len(text.strip()) < 50:
             raise HTTPException(status_code=422, detail="PDF has no extractable text (scanned image?).")
 
+        with profiler.span("rag.build_index", chars=len(text)):
+            index = await asyncio.to_thread(retrieval.build_index, text)
         state["pdf_text"] = text
+        state["rag_index"] = index
         add_log("SYSTEM", f"PDF indexed: {file.filename} ({len(reader.pages)}p, {len(text):,} chars)", "info")
+        if index is not None:
+            add_log(
+                "SYSTEM",
+                f"RAG vector index: {len(index)} passages, {index.nlist} list(s), "
+                f"{index.matrix_bytes // 1024} KB float32, built in {index.build_ms}ms",
+                "info",
+            )
         save_state_to_db()
         return {
             "status": "ok",
             "filename": file.filename,
             "pages": len(reader.pages),
             "chars": len(text),
+            "passages": len(index) if index else 0,
             "size_mb": round(len(contents) / 1024 / 1024, 2),
             "preview": text[:200].strip(),
         }
@@ -681,7 +917,7 @@ def export_csv():
                   "status", "icp_score", "safety_check", "last_log", "score_breakdown"]
     writer = csv.DictWriter(output, fieldnames=fieldnames, extrasaction="ignore")
     writer.writeheader()
-    writer.writerows(state["leads"])
+    writer.writerows(state["leads"].iter_dicts())
     output.seek(0)
     filename = f"nexus-leads-{datetime.now().strftime('%Y%m%d-%H%M%S')}.csv"
     return StreamingResponse(
@@ -693,12 +929,14 @@ def export_csv():
 
 @app.get("/api/export/audit")
 def export_audit():
-    if not state["audit_trail"]:
+    if not audit_log.count():
         raise HTTPException(status_code=404, detail="No audit trail to export")
+    missing = audit_log.missing_archives()
+    if missing:
+        raise HTTPException(status_code=500, detail=f"{len(missing)} audit archive(s) missing, e.g. {missing[0]}")
     filename = f"nexus-audit-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
-    content = json.dumps(state["audit_trail"], indent=2, default=str)
     return StreamingResponse(
-        io.BytesIO(content.encode()),
+        _stream_json_array(audit_log.query()),
         media_type="application/json",
         headers={"Content-Disposition": f"attachment; filename={filename}"},
     )
@@ -710,19 +948,132 @@ def post_run_swarm():
     _run_swarm_step()
     elapsed_ms = round((time.time() - t0) * 1000)
     add_log("SYSTEM", f"Swarm cycle complete in {elapsed_ms}ms", "info")
-    return {
-        "leads":        state["leads"],
-        "logs":         state["logs"][:20],
-        "execution_ms": elapsed_ms,
-    }
+    body = (
+        b'{"leads":' + state["leads"].to_json()
+        + b',"logs":' + json.dumps(state["logs"][:20]).encode()
+        + b',"execution_ms":' + str(elapsed_ms).encode() + b"}"
+    )
+    return Response(content=body, media_type="application/json")
+
+
+@app.post("/api/dedup")
+def post_dedup():
+    report = resolve_leads()
+    return report or {"scanned": 0, "merged": 0, "entities": len(entity_index), "merged_total": entity_index.merged_total}
+
+
+@app.post("/api/dedup/unmerge/{lead_id}")
+def post_dedup_unmerge(lead_id: str):
+    """Restore a lead absorbed by entity resolution as its own entity."""
+    with _dedup_lock:
+        if not entity_index.loaded:
+            entity_index.load()
+        record = entity_index.unmerge(lead_id)
+        if record is None:
+            raise HTTPException(status_code=404, detail="No recorded merge for this lead")
+        if state["leads"].by_id(lead_id) is None:
+            state["leads"].append(record)
+    add_log("HUNTER", f"Entity resolution: restored {record.get('company', lead_id)} as a separate lead", "hunter")
+    save_state_to_db()
+    return record
+
+
+@app.get("/api/crm/status")
+def get_crm_status():
+    return crm_sync_engine.stats()
+
+
+@app.post("/api/crm/flush")
+def post_crm_flush(requeue_dead: bool = False):
+    requeued = crm_sync_engine.requeue_dead() if requeue_dead else []
+    crm_sync.reopen_failed(requeued, state["leads"].by_id)
+    report = _flush_crm()
+    report["requeued"] = len(requeued)
+    return report
+
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+
+def _require_admin(token: Optional[str]):
+    """Admin endpoints are disabled (404) unless ADMIN_TOKEN is set; a wrong or missing token is 403."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not token or not secrets.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+@app.get("/api/admin/profiling")
+def get_profiling(x_admin_token: Optional[str] = Header(None)):
+    _require_admin(x_admin_token)
+    return profiler.status()
+
+
+@app.post("/api/admin/profiling")
+def post_profiling(body: ProfilingModel, x_admin_token: Optional[str] = Header(None)):
+    _require_admin(x_admin_token)
+    status = profiler.configure(
+        sampling=body.sampling, tracing=body.tracing, memory=body.memory, interval_ms=body.interval_ms,
+    )
+    add_log(
+        "SYSTEM",
+        f"Profiling: sampling={'on' if status['sampling'] else 'off'} ({status['interval_ms']}ms), "
+        f"tracing={'on' if status['tracing'] else 'off'}, memory={'on' if status['memory'] else 'off'}",
+        "info",
+    )
+    return status
+
+
+@app.post("/api/admin/profiling/reset")
+def post_profiling_reset(x_admin_token: Optional[str] = Header(None)):
+    _require_admin(x_admin_token)
+    profiler.reset()
+    return profiler.status()
+
+
+@app.get("/api/admin/profiling/traces")
+def get_profiling_traces(limit: int = 50, min_ms: float = 0.0, x_admin_token: Optional[str] = Header(None)):
+    _require_admin(x_admin_token)
+    return profiler.traces(limit=max(1, min(limit, 1000)), min_ms=min_ms)
+
+
+@app.get("/api/admin/profiling/memory")
+def get_profiling_memory(top: int = 25, diff: bool = False, x_admin_token: Optional[str] = Header(None)):
+    _require_admin(x_admin_token)
+    if not profiler.memory:
+        raise HTTPException(status_code=409, detail="Memory profiling is off")
+    return profiler.memory_snapshot(top=max(1, min(top, 500)), diff=diff)
+
+
+@app.get("/api/admin/profiling/flamegraph")
+def get_profiling_flamegraph(source: str = "samples", x_admin_token: Optional[str] = Header(None)):
+    """Collapsed stacks for flamegraph.pl / speedscope: sample counts, span self-time (us) or live bytes."""
+    _require_admin(x_admin_token)
+    try:
+        text = profiler.collapsed(source)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    filename = f"nexus-{source}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.folded"
+    return Response(
+        content=text,
+        media_type="text/plain",
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
 
 
 @app.post("/api/reset")
 def post_reset():
-    state["leads"]       = _initial_leads()
+    with _dedup_lock:
+        state["leads"].close()
+        state["leads"]   = LeadStore.from_list(_initial_leads())
+        entity_index.clear()
     state["logs"]        = []
     state["pdf_text"]    = ""
-    state["audit_trail"] = []
+    state["rag_index"]   = None
+    state["dedup"]       = None
+    audit_log.clear()
+    crm_sync_engine.clear()
+    clear_persisted(SNAPSHOT_PATH, DB_PATH)
     if os.path.exists(DB_PATH):
         try:
             conn = sqlite3.connect(DB_PATH)
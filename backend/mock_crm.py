@@ -0,0 +1,213 @@
+"""
+mock_crm.py - Local mock CRM for the Closer sync engine
+
+Serve:      python mock_crm.py --port 8100 [--fail-rate 0.1] [--record-fail-rate 0.05] [--latency-ms 20]
+            then run the backend with CRM_URL=http://localhost:8100
+Benchmark:  python mock_crm.py --bench 20000 [--fail-rate 0.2] [--record-fail-rate 0.05]
+
+API
+---
+POST /api/opportunities/bulk  {"records": [{idempotency_key, external_id, ...}]}
+                              -> {"results": [{idempotency_key, status, id}]}
+                              status: created | updated | duplicate | error
+GET  /api/opportunities/stats -> counts of opportunities, requests and injected failures
+POST /api/reset               -> clear all mock CRM data
+
+--fail-rate fails whole requests with 503 *after* applying them half of the time,
+so benchmarks also cover "CRM committed but the client never saw the response".
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockCRM:
+    def __init__(self, fail_rate: float = 0.0, record_fail_rate: float = 0.0, latency_ms: float = 0.0, seed: int = 0):
+        self.fail_rate = fail_rate
+        self.record_fail_rate = record_fail_rate
+        self.latency_ms = latency_ms
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.by_key = {}           # idempotency_key -> opportunity id
+            self.by_external = {}      # external_id -> opportunity id
+            self.opportunities = {}    # id -> record
+            self.requests = 0
+            self.injected_failures = 0
+            self.duplicates = 0
+
+    def bulk_upsert(self, records):
+        """Returns (http_status, results)."""
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        with self.lock:
+            self.requests += 1
+            fail = self.rng.random() < self.fail_rate
+            if fail and self.rng.random() < 0.5:
+                self.injected_failures += 1
+                return 503, []
+            results = [self._upsert(r) for r in records]
+            if fail:
+                self.injected_failures += 1
+                return 503, []
+            return 200, results
+
+    def _upsert(self, record):
+        key = record.get("idempotency_key")
+        if not key:
+            return {"idempotency_key": key, "status": "error", "error": "missing idempotency_key"}
+        if key in self.by_key:
+            self.duplicates += 1
+            return {"idempotency_key": key, "status": "duplicate", "id": self.by_key[key]}
+        if self.rng.random() < self.record_fail_rate:
+            self.injected_failures += 1
+            return {"idempotency_key": key, "status": "error", "error": "UNABLE_TO_LOCK_ROW"}
+        ext = record.get("external_id")
+        if ext in self.by_external:
+            opp_id, status = self.by_external[ext], "updated"
+        else:
+            opp_id, status = f"OPP-{len(self.opportunities) + 1:07d}", "created"
+        self.by_key[key] = opp_id
+        if ext is not None:
+            self.by_external[ext] = opp_id
+        self.opportunities[opp_id] = record
+        return {"idempotency_key": key, "status": status, "id": opp_id}
+
+    def stats(self):
+        with self.lock:
+            return {
+                "opportunities": len(self.opportunities),
+                "requests": self.requests,
+                "injected_failures": self.injected_failures,
+                "duplicate_deliveries": self.duplicates,
+            }
+
+
+def make_handler(crm: MockCRM):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, status, body):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/api/opportunities/stats":
+                self._send(200, crm.stats())
+            else:
+                self._send(404, {"detail": "not found"})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", "0"))
+            raw = self.rfile.read(length) if length else b"{}"
+            if self.path == "/api/reset":
+                crm.reset()
+                self._send(200, {"status": "reset"})
+                return
+            if self.path != "/api/opportunities/bulk":
+                self._send(404, {"detail": "not found"})
+                return
+            try:
+                records = json.loads(raw).get("records", [])
+            except ValueError:
+                self._send(400, {"detail": "invalid JSON"})
+                return
+            status, results = crm.bulk_upsert(records)
+            if status != 200:
+                self._send(status, {"detail": "Service Unavailable"})
+            else:
+                self._send(200, {"results": results})
+
+        def log_message(self, fmt, *args):
+            pass
+
+    return Handler
+
+
+def serve(crm: MockCRM, port: int) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(crm))
+    server.daemon_threads = True
+    return server
+
+
+def bench(n: int, crm: MockCRM, batch_size: int, concurrency: int):
+    from crm_sync import HTTPCRMAdapter, SyncEngine
+
+    server = serve(crm, 0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = SyncEngine(
+            os.path.join(tmp, "bench.db"), HTTPCRMAdapter(url, pool_size=concurrency),
+            batch_size=batch_size, concurrency=concurrency, max_attempts=50,
+        )
+        engine.init()
+        leads = [{"id": f"B-{i}", "company": f"Bench Co {i}", "role": "CTO", "location": "Hyderabad",
+                  "employees": 500, "budget": "200", "icp_score": 80} for i in range(n)]
+
+        t0 = time.time()
+        engine.enqueue(leads)
+        engine.enqueue(leads[: n // 10])     # re-enqueue must be a no-op
+        rounds = 0
+        while True:
+            rounds += 1
+            engine.flush(max_batches=concurrency * 4)
+            stats = engine.stats()
+            if stats["pending"] == 0:
+                break
+            # failed rows back off; make them due again so the bench measures recovery, not sleep
+            conn = engine._connect()
+            conn.execute("UPDATE crm_outbox SET next_attempt_at=0 WHERE status='pending'")
+            conn.commit()
+            conn.close()
+        elapsed = time.time() - t0
+        engine.adapter.close()
+
+    server.shutdown()
+    crm_stats = crm.stats()
+    print(f"leads:               {n}")
+    print(f"batch/concurrency:   {batch_size}/{concurrency}")
+    print(f"elapsed:             {elapsed:.2f}s ({n / elapsed:,.0f} opportunities/s)")
+    print(f"flush rounds:        {rounds}")
+    print(f"outbox:              sent={stats['sent']} dead={stats['dead']}")
+    print(f"CRM:                 {crm_stats}")
+    ok = crm_stats["opportunities"] == n - stats["dead"]
+    print("no duplicates created" if ok else "DUPLICATES OR LOSS DETECTED")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--record-fail-rate", type=float, default=0.0)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--bench", type=int, default=0, help="run a local throughput/recovery benchmark")
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    crm = MockCRM(args.fail_rate, args.record_fail_rate, args.latency_ms)
+    if args.bench:
+        sys.exit(0 if bench(args.bench, crm, args.batch_size, args.concurrency) else 1)
+    server = serve(crm, args.port)
+    print(f"Mock CRM listening on http://127.0.0.1:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,417 @@
+"""
+profiling.py - Opt-in runtime profiling for the swarm and API hot paths
+
+Everything is off by default and toggled at runtime (see /api/admin/profiling);
+PROFILE_TRACING=1 turns tracing on from startup so boot jobs are traced too:
+
+    sampling  a daemon thread reads sys._current_frames() every PROFILE_SAMPLE_MS
+              and counts stacks that pass through the app's own modules (idle
+              worker/event-loop threads are dropped). Stacks are kept as tuples
+              of code objects and only formatted when downloaded.
+    tracing   TraceMiddleware opens a trace per HTTP request; span() records
+              nested timed spans (agent -> rag -> llm -> db) through contextvars,
+              so spans opened in threadpool workers attach to their request.
+              Background jobs open their own root with trace("job.<name>").
+    memory    tracemalloc snapshots: top allocation sites, and growth since the
+              previous snapshot.
+
+Samples, span self-times and allocation tracebacks export as collapsed stacks
+("frame;frame;frame value" per line), the input format of flamegraph.pl,
+speedscope and inferno.
+"""
+
+import contextvars
+import itertools
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+PROFILE_SAMPLE_MS   = float(os.getenv("PROFILE_SAMPLE_MS", "10"))
+PROFILE_MAX_TRACES  = int(os.getenv("PROFILE_MAX_TRACES", "200"))
+PROFILE_MEM_FRAMES  = int(os.getenv("PROFILE_MEM_FRAMES", "16"))
+PROFILE_TRACING     = os.getenv("PROFILE_TRACING", "0") == "1"
+
+_trace_var: contextvars.ContextVar = contextvars.ContextVar("nexus_trace", default=None)
+_span_var: contextvars.ContextVar = contextvars.ContextVar("nexus_span", default=None)
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Trace:
+    _ids = itertools.count(1)
+
+    def __init__(self, name: str):
+        self.id = next(self._ids)
+        self.name = name
+        self.started_at = datetime.now().isoformat()
+        self.t0 = time.perf_counter()
+        self.duration_ms = 0.0
+        self.attrs: Dict[str, object] = {}
+        self.spans: List[dict] = []
+        self._span_ids = itertools.count(1)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "attrs": self.attrs,
+            "spans": self.spans,
+        }
+
+
+class _Span:
+    __slots__ = ("profiler", "trace", "name", "attrs", "id", "parent", "t0", "_tokens", "_prev_label")
+
+    def __init__(self, profiler: "Profiler", trace: Trace, name: str, attrs: dict):
+        self.profiler = profiler
+        self.trace = trace
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.id = next(self.trace._span_ids)
+        self.parent = _span_var.get()
+        self._tokens = _span_var.set(self.id)
+        ident = threading.get_ident()
+        labels = self.profiler._thread_labels
+        self._prev_label = labels.get(ident)
+        labels[ident] = self.trace.name
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        _span_var.reset(self._tokens)
+        ident = threading.get_ident()
+        if self._prev_label is None:
+            self.profiler._thread_labels.pop(ident, None)
+        else:
+            self.profiler._thread_labels[ident] = self._prev_label
+        record = {
+            "id": self.id,
+            "parent": self.parent,
+            "name": self.name,
+            "start_ms": round((self.t0 - self.trace.t0) * 1000, 3),
+            "duration_ms": round((end - self.t0) * 1000, 3),
+        }
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        if self.attrs:
+            record["attrs"] = self.attrs
+        self.trace.spans.append(record)
+        return False
+
+
+class _TraceScope:
+    def __init__(self, profiler: "Profiler", name: str):
+        self.profiler = profiler
+        self.trace = Trace(name)
+
+    def __enter__(self) -> Trace:
+        self._token = _trace_var.set(self.trace)
+        self._span_token = _span_var.set(None)
+        return self.trace
+
+    def __exit__(self, *exc):
+        self.trace.duration_ms = round((time.perf_counter() - self.trace.t0) * 1000, 3)
+        _span_var.reset(self._span_token)
+        _trace_var.reset(self._token)
+        self.profiler._traces.append(self.trace)
+        return False
+
+
+class SamplingProfiler:
+    """Wall-clock stack sampler. Only stacks with a frame under `app_dir` are counted."""
+
+    def __init__(self, app_dir: str, labels: Dict[int, str], interval_ms: float = PROFILE_SAMPLE_MS):
+        self.app_dir = app_dir
+        self.labels = labels
+        self.interval = max(1.0, interval_ms) / 1000
+        self.counts: Counter = Counter()
+        self.samples = 0
+        self.sampling_ms = 0.0
+        self._in_app: Dict[object, bool] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="nexus-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+        self._thread = None
+
+    def clear(self):
+        self.counts.clear()
+        self.samples = 0
+        self.sampling_ms = 0.0
+
+    def _is_app(self, code) -> bool:
+        hit = self._in_app.get(code)
+        if hit is None:
+            filename = code.co_filename
+            # Module frames don't count: under `python main.py` the idle event loop sits below main.py <module>.
+            hit = (filename.startswith(self.app_dir) and "site-packages" not in filename
+                   and code.co_name != "<module>")
+            self._in_app[code] = hit
+        return hit
+
+    def _run(self):
+        me = threading.get_ident()
+        names: Dict[int, str] = {}
+        while not self._stop.wait(self.interval):
+            t0 = time.perf_counter()
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                in_app = False
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(code)
+                    if not in_app and self._is_app(code):
+                        in_app = True
+                    frame = frame.f_back
+                if not in_app:
+                    continue
+                label = self.labels.get(ident)
+                if label is None:
+                    label = names.get(ident)
+                    if label is None:
+                        names.update((t.ident, t.name) for t in threading.enumerate())
+                        label = names.get(ident, f"thread-{ident}")
+                self.counts[(label, tuple(reversed(stack)))] += 1
+            self.samples += 1
+            self.sampling_ms += (time.perf_counter() - t0) * 1000
+
+    def collapsed(self) -> str:
+        lines = []
+        for (label, stack), n in self.counts.most_common():
+            frames = ";".join(_frame_name(code) for code in stack)
+            lines.append(f"{_clean(label)};{frames} {n}")
+        return "\n".join(lines) + ("\n" if lines else "")
+
+
+def _frame_name(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _clean(name: str) -> str:
+    return name.replace(";", ":").replace(" ", "_")
+
+
+class Profiler:
+    def __init__(self, app_dir: Optional[str] = None, max_traces: int = PROFILE_MAX_TRACES):
+        self.app_dir = os.path.abspath(app_dir or os.path.dirname(__file__))
+        self._thread_labels: Dict[int, str] = {}
+        self.sampler = SamplingProfiler(self.app_dir, self._thread_labels)
+        self.tracing = PROFILE_TRACING
+        self.memory = False
+        self.enabled_at: Optional[str] = datetime.now().isoformat() if self.tracing else None
+        self._traces: "deque[Trace]" = deque(maxlen=max_traces)
+        self._mem_prev: Optional[tracemalloc.Snapshot] = None
+        self._lock = threading.Lock()
+
+    # -- control ------------------------------------------------------------
+
+    @property
+    def sampling(self) -> bool:
+        return self.sampler.running
+
+    def configure(self, sampling: Optional[bool] = None, tracing: Optional[bool] = None,
+                  memory: Optional[bool] = None, interval_ms: Optional[float] = None) -> dict:
+        with self._lock:
+            if interval_ms is not None:
+                self.sampler.interval = max(1.0, interval_ms) / 1000
+            if sampling is True:
+                self.sampler.start()
+            elif sampling is False:
+                self.sampler.stop()
+            if tracing is not None:
+                self.tracing = tracing
+            if memory is True and not tracemalloc.is_tracing():
+                tracemalloc.start(PROFILE_MEM_FRAMES)
+                self._mem_prev = None
+            elif memory is False and tracemalloc.is_tracing():
+                tracemalloc.stop()
+                self._mem_prev = None
+            self.memory = tracemalloc.is_tracing()
+            active = self.sampling or self.tracing or self.memory
+            if active and self.enabled_at is None:
+                self.enabled_at = datetime.now().isoformat()
+            elif not active:
+                self.enabled_at = None
+        return self.status()
+
+    def reset(self):
+        self.sampler.clear()
+        self._traces.clear()
+        self._mem_prev = None
+
+    def status(self) -> dict:
+        s = self.sampler
+        return {
+            "sampling": self.sampling,
+            "tracing": self.tracing,
+            "memory": self.memory,
+            "enabled_at": self.enabled_at,
+            "interval_ms": round(s.interval * 1000, 2),
+            "samples": s.samples,
+            "distinct_stacks": len(s.counts),
+            "sampler_cpu_ms": round(s.sampling_ms, 1),
+            "sampler_avg_us": round(s.sampling_ms * 1000 / s.samples, 1) if s.samples else 0,
+            "traces": len(self._traces),
+            "traced_memory_kb": tracemalloc.get_traced_memory()[0] // 1024 if self.memory else 0,
+        }
+
+    # -- tracing ------------------------------------------------------------
+
+    def trace(self, name: str):
+        """Root scope for one request or job; a no-op unless tracing is on."""
+        return _TraceScope(self, name) if self.tracing else _NULL_SPAN
+
+    def span(self, name: str, **attrs):
+        """Timed child span of the current trace; free when there is no active trace."""
+        trace = _trace_var.get()
+        if trace is None:
+            return _NULL_SPAN
+        return _Span(self, trace, name, attrs)
+
+    def traces(self, limit: int = 50, min_ms: float = 0.0) -> List[dict]:
+        out = []
+        for trace in reversed(self._traces):
+            if trace.duration_ms >= min_ms:
+                out.append(trace.to_dict())
+                if len(out) >= limit:
+                    break
+        return out
+
+    def span_collapsed(self) -> str:
+        """Span self-time in microseconds, collapsed by trace name and span path."""
+        totals: Counter = Counter()
+        for trace in list(self._traces):
+            spans = {s["id"]: s for s in trace.spans}
+            child_ms: Counter = Counter()
+            for s in trace.spans:
+                if s["parent"] is not None:
+                    child_ms[s["parent"]] += s["duration_ms"]
+            root = _clean(trace.name)
+            untracked = trace.duration_ms - sum(s["duration_ms"] for s in trace.spans if s["parent"] is None)
+            totals[root] += max(0.0, untracked)
+            for s in trace.spans:
+                path = [_clean(s["name"])]
+                parent = s["parent"]
+                while parent is not None and parent in spans:
+                    path.append(_clean(spans[parent]["name"]))
+                    parent = spans[parent]["parent"]
+                key = root + ";" + ";".join(reversed(path))
+                totals[key] += max(0.0, s["duration_ms"] - child_ms[s["id"]])
+        lines = [f"{k} {int(v * 1000)}" for k, v in totals.most_common() if v > 0]
+        return "\n".join(lines) + ("\n" if lines else "")
+
+    # -- memory -------------------------------------------------------------
+
+    def _take_snapshot(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        ))
+
+    def memory_snapshot(self, top: int = 25, diff: bool = False) -> dict:
+        """Top allocation sites; with diff=True, growth since the previous snapshot."""
+        if not tracemalloc.is_tracing():
+            return {"memory": False, "top": []}
+        snapshot = self._take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        if diff and self._mem_prev is not None:
+            stats = snapshot.compare_to(self._mem_prev, "lineno")[:top]
+            rows = [{"site": str(s.traceback[0]), "size_kb": round(s.size / 1024, 1),
+                     "size_diff_kb": round(s.size_diff / 1024, 1), "count": s.count,
+                     "count_diff": s.count_diff} for s in stats]
+        else:
+            stats = snapshot.statistics("lineno")[:top]
+            rows = [{"site": str(s.traceback[0]), "size_kb": round(s.size / 1024, 1), "count": s.count}
+                    for s in stats]
+        self._mem_prev = snapshot
+        return {
+            "memory": True,
+            "taken_at": datetime.now().isoformat(),
+            "traced_kb": current // 1024,
+            "peak_kb": peak // 1024,
+            "diff": diff,
+            "top": rows,
+        }
+
+    def memory_collapsed(self) -> str:
+        """Live allocated bytes per allocation traceback, as collapsed stacks."""
+        if not tracemalloc.is_tracing():
+            return ""
+        lines = []
+        for stat in self._take_snapshot().statistics("traceback"):
+            frames = ";".join(
+                f"{os.path.basename(f.filename)}:{f.lineno}" for f in reversed(stat.traceback)
+            )
+            lines.append(f"{frames} {stat.size}")
+        return "\n".join(lines) + ("\n" if lines else "")
+
+    def collapsed(self, source: str = "samples") -> str:
+        if source == "samples":
+            return self.sampler.collapsed()
+        if source == "spans":
+            return self.span_collapsed()
+        if source == "memory":
+            return self.memory_collapsed()
+        raise ValueError(f"unknown profile source: {source}")
+
+
+class TraceMiddleware:
+    """ASGI middleware: one trace per HTTP request while tracing is on; otherwise a pass-through."""
+
+    def __init__(self, app, profiler: Profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.profiler.tracing:
+            await self.app(scope, receive, send)
+            return
+        with _TraceScope(self.profiler, f"{scope['method']} {scope['path']}") as trace:
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    trace.attrs["status"] = message["status"]
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,270 @@
+"""
+retrieval.py - Offline CPU retriever for the Professor RAG lookup
+
+The uploaded knowledge base is split into ~300 char passages and embedded with
+a signed feature-hashing model (word unigrams + bigrams, sublinear tf, corpus
+IDF over hashed dimensions, L2 normalized) into EMBED_DIM dimensions. Vectors
+are stored row-major in a single float32 `array('f')` matrix.
+
+Hashed cosine is only used to build a shortlist; the top RERANK_CANDIDATES are
+rescored on their unhashed features. When `anchor` terms are given, the reported
+hit quality is the cosine against those terms alone, so generic topic or role
+words can rank passages but never make one without the location count as a hit.
+
+The ANN index is IVF style: spherical k-means centroids trained on a sample,
+every passage assigned to its nearest centroid using its ASSIGN_TOP_DIMS
+heaviest dimensions, and queries scoring only the `nprobe` closest lists.
+Small corpora (< IVF_MIN_PASSAGES) are searched flat.
+
+Location names are expanded through REGION_TERMS before embedding, so a lead in
+"Vijayawada" also matches passages about "coastal Andhra" or "AP ports".
+"""
+
+import heapq
+import math
+import random
+import re
+import time
+import zlib
+from array import array
+from itertools import repeat
+from operator import add, mul
+from typing import Dict, List, Optional, Tuple
+
+EMBED_DIM = 512
+PASSAGE_CHARS = 300
+PASSAGE_OVERLAP = 60
+IVF_MIN_PASSAGES = 2048
+IVF_MAX_LISTS = 64
+KMEANS_ITERS = 4
+ASSIGN_TOP_DIMS = 16
+DEFAULT_NPROBE = 8
+RERANK_CANDIDATES = 64
+MIN_HIT_SCORE = 0.1
+
+REGION_TERMS = {
+    "Visakhapatnam": ["Vizag", "Andhra Pradesh", "coastal Andhra", "AP ports", "port", "pharma"],
+    "Vijayawada": ["Andhra Pradesh", "coastal Andhra", "AP", "Krishna district", "Amaravati"],
+    "Andhra Pradesh": ["AP", "coastal Andhra", "Amaravati", "Vijayawada", "Visakhapatnam"],
+    "Hyderabad": ["Telangana", "Secunderabad", "Cyberabad", "HITEC City"],
+    "Bengaluru": ["Bangalore", "Karnataka", "Electronic City", "Whitefield"],
+    "Chennai": ["Madras", "Tamil Nadu", "Ennore port", "logistics"],
+    "Kochi": ["Cochin", "Kerala", "port", "shipyard"],
+    "Tirupati": ["Andhra Pradesh", "Rayalaseema", "Chittoor"],
+}
+
+_WORD = re.compile(r"[a-z0-9]+")
+_SENTENCE = re.compile(r"(?<=[.!?])\s+|\n{2,}")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were will with".split()
+)
+
+
+def _tokens(text: str) -> List[str]:
+    return [t for t in _WORD.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def features(text: str) -> Dict[str, float]:
+    """Sublinear term weights for word unigrams and (half-weight) bigrams."""
+    counts: Dict[str, float] = {}
+    words = _tokens(text)
+    for w in words:
+        counts[w] = counts.get(w, 0.0) + 1.0
+    for a, b in zip(words, words[1:]):
+        bg = a + " " + b
+        counts[bg] = counts.get(bg, 0.0) + 0.5
+    return {f: (1.0 + math.log(tf) if tf >= 1 else tf) for f, tf in counts.items()}
+
+
+def _slot(feature: str, dim: int) -> Tuple[int, float]:
+    h = zlib.crc32(feature.encode())
+    return h % dim, (1.0 if (h >> 31) & 1 else -1.0)
+
+
+def hashed(feats: Dict[str, float], dim: int = EMBED_DIM) -> Dict[int, float]:
+    """Fold named features into `dim` signed hash buckets."""
+    vec: Dict[int, float] = {}
+    for feature, w in feats.items():
+        j, sign = _slot(feature, dim)
+        vec[j] = vec.get(j, 0.0) + sign * w
+    return vec
+
+
+def _normalize(vec: Dict, weights=None) -> Dict:
+    if weights is not None:
+        vec = {k: v * weights(k) for k, v in vec.items()}
+    norm = math.sqrt(sum(v * v for v in vec.values()))
+    if norm == 0:
+        return {}
+    return {k: v / norm for k, v in vec.items() if v}
+
+
+def location_terms(location: str) -> List[Tuple[str, float]]:
+    """Weighted location terms: the location itself plus its REGION_TERMS."""
+    return [(location, 2.0)] + [(t, 1.0) for t in REGION_TERMS.get(location, [])]
+
+
+def expand_query(location: str, role: str = "") -> List[Tuple[str, float]]:
+    """Weighted query terms: location_terms(), then role/topic context for ranking."""
+    terms = location_terms(location)
+    if role:
+        terms.append((role, 0.5))
+    terms.append(("cyber security threat", 0.5))
+    return terms
+
+
+def term_features(terms: List[Tuple[str, float]]) -> Dict[str, float]:
+    """Sum of per-term features, so no bigrams are formed across term boundaries."""
+    feats: Dict[str, float] = {}
+    for term, weight in terms:
+        for f, v in features(term).items():
+            feats[f] = feats.get(f, 0.0) + weight * v
+    return feats
+
+
+def split_passages(text: str, size: int = PASSAGE_CHARS, overlap: int = PASSAGE_OVERLAP) -> List[str]:
+    """Greedy sentence packing into ~`size` char passages; long sentences are windowed."""
+    passages: List[str] = []
+    current = ""
+    for sentence in _SENTENCE.split(text):
+        sentence = " ".join(sentence.split())
+        if not sentence:
+            continue
+        while len(sentence) > size:
+            if current:
+                passages.append(current)
+                current = ""
+            passages.append(sentence[:size])
+            sentence = sentence[size - overlap:]
+        if current and len(current) + 1 + len(sentence) > size:
+            passages.append(current)
+            current = current[-overlap:] if overlap else ""
+        current = f"{current} {sentence}".strip()
+    if current:
+        passages.append(current)
+    return passages
+
+
+def _sparse_dot_rows(q: Dict[int, float], matrix: array, dim: int, rows) -> List[Tuple[float, int]]:
+    items = list(q.items())
+    out = []
+    for i in rows:
+        base = i * dim
+        out.append((sum(v * matrix[base + j] for j, v in items), i))
+    return out
+
+
+class VectorIndex:
+    def __init__(self, passages: List[str], dim: int = EMBED_DIM, seed: int = 0):
+        t0 = time.time()
+        self.dim = dim
+        self.passages = passages
+        n = len(passages)
+
+        raw = [hashed(features(p), dim) for p in passages]
+        df = [0] * dim
+        for vec in raw:
+            for j in vec:
+                df[j] += 1
+        self.idf = [math.log((n + 1) / (d + 1)) + 1.0 for d in df]
+        sparse = [_normalize(vec, self.idf.__getitem__) for vec in raw]
+        del raw
+
+        self.matrix = array("f", bytes(4 * dim * n))
+        for i, vec in enumerate(sparse):
+            base = i * dim
+            for j, v in vec.items():
+                self.matrix[base + j] = v
+
+        self.nlist = 1 if n < IVF_MIN_PASSAGES else min(IVF_MAX_LISTS, int(math.sqrt(n)))
+        self.lists: List[List[int]] = [list(range(n))]
+        self._centroid_cols: List[List[float]] = []
+        if self.nlist > 1:
+            self._train_ivf(sparse, random.Random(seed))
+        self.build_ms = round((time.time() - t0) * 1000, 1)
+
+    def __len__(self):
+        return len(self.passages)
+
+    @property
+    def matrix_bytes(self) -> int:
+        return self.matrix.itemsize * len(self.matrix)
+
+    def _centroid_scores(self, items, cols: List[List[float]]) -> List[float]:
+        scores = [0.0] * self.nlist
+        for j, v in items:
+            scores = list(map(add, scores, map(mul, cols[j], repeat(v))))
+        return scores
+
+    def _assign(self, vec: Dict[int, float], cols: List[List[float]]) -> int:
+        top = heapq.nlargest(ASSIGN_TOP_DIMS, vec.items(), key=lambda kv: abs(kv[1]))
+        scores = self._centroid_scores(top, cols)
+        return max(range(self.nlist), key=scores.__getitem__)
+
+    def _columns(self, centroids: List[Dict[int, float]]) -> List[List[float]]:
+        cols = [[0.0] * self.nlist for _ in range(self.dim)]
+        for c, cen in enumerate(centroids):
+            for j, v in cen.items():
+                cols[j][c] = v
+        return cols
+
+    def _train_ivf(self, sparse: List[Dict[int, float]], rng: random.Random):
+        n = len(sparse)
+        sample = rng.sample(range(n), min(n, self.nlist * 32))
+        centroids = [dict(sparse[i]) for i in sample[:self.nlist]]
+        for _ in range(KMEANS_ITERS):
+            cols = self._columns(centroids)
+            sums: List[Dict[int, float]] = [{} for _ in range(self.nlist)]
+            for i in sample:
+                acc = sums[self._assign(sparse[i], cols)]
+                for j, v in sparse[i].items():
+                    acc[j] = acc.get(j, 0.0) + v
+            for c, acc in enumerate(sums):
+                norm = math.sqrt(sum(v * v for v in acc.values()))
+                if norm:
+                    centroids[c] = {j: v / norm for j, v in acc.items()}
+        cols = self._columns(centroids)
+        self.lists = [[] for _ in range(self.nlist)]
+        for i, vec in enumerate(sparse):
+            self.lists[self._assign(vec, cols) if vec else 0].append(i)
+        self._centroid_cols = cols
+
+    def _feature_idf(self, feature: str) -> float:
+        return self.idf[_slot(feature, self.dim)[0]]
+
+    def search(self, query, k: int = 3, nprobe: int = DEFAULT_NPROBE,
+               anchor: Optional[List[Tuple[str, float]]] = None) -> List[Tuple[float, str]]:
+        """
+        Top-k (score, passage) pairs, best first. `query` is text or expand_query()
+        terms. The ANN shortlist is reranked by cosine over the named (unhashed)
+        features, so the returned score is free of hash-collision noise. With
+        `anchor` terms (e.g. location_terms()) the passages are still ranked on
+        `query`, but the returned score is the cosine against `anchor` only.
+        """
+        q_feats = features(query) if isinstance(query, str) else term_features(query)
+        q = _normalize(hashed(q_feats, self.dim), self.idf.__getitem__)
+        if not q or not self.passages:
+            return []
+        if self.nlist > 1:
+            scores = self._centroid_scores(q.items(), self._centroid_cols)
+            probe = heapq.nlargest(max(1, nprobe), range(self.nlist), key=scores.__getitem__)
+            rows = [i for c in probe for i in self.lists[c]]
+        else:
+            rows = self.lists[0]
+        shortlist = heapq.nlargest(max(k, RERANK_CANDIDATES), _sparse_dot_rows(q, self.matrix, self.dim, rows))
+
+        q_exact = _normalize(q_feats, self._feature_idf)
+        a_exact = _normalize(term_features(anchor), self._feature_idf) if anchor else None
+        reranked = []
+        for _, i in shortlist:
+            p_exact = _normalize(features(self.passages[i]), self._feature_idf)
+            score = sum(v * p_exact.get(f, 0.0) for f, v in q_exact.items())
+            quality = score if a_exact is None else sum(v * p_exact.get(f, 0.0) for f, v in a_exact.items())
+            reranked.append((score, quality, i))
+        hits = heapq.nlargest(k, reranked)
+        return [(round(quality, 4), self.passages[i]) for score, quality, i in hits if score > 0]
+
+
+def build_index(text: str) -> Optional[VectorIndex]:
+    passages = split_passages(text)
+    return VectorIndex(passages) if passages else None
@@ -0,0 +1,314 @@
+"""
+scoring_rules.py - Hunter/Guardian scoring rules for Nexus AI
+
+Rules live in a JSON file (SCORING_RULES_PATH, default data/scoring_rules.json)
+and are compiled into lookup tables:
+
+    role / location   -> dict lookups with a default score
+    employees / budget -> ascending tier thresholds searched with bisect
+    blend             -> (role, location, employees, budget) weight tuple
+
+The file is authoritative: it must define every section and key in
+DEFAULT_RULES (validate_rules), and a role or location removed from it is no
+longer scored. DEFAULT_RULES only applies while the file does not exist.
+
+RulesStore.get() re-stats the file on each call and recompiles when its mtime
+changes, so edits take effect on the next swarm step. A file that fails to
+parse or validate is reported in `error` and the previous rules stay active.
+"""
+
+import bisect
+import copy
+import heapq
+import json
+import os
+import re
+import threading
+from collections import Counter
+from datetime import datetime
+from itertools import repeat
+from typing import Dict, List, Optional
+
+RULES_PATH = os.getenv(
+    "SCORING_RULES_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "scoring_rules.json"),
+)
+
+DEFAULT_RULES = {
+    "hunter": {
+        "weights": {"role": 0.3, "location": 0.3, "employees": 0.2, "budget": 0.2},
+        "role_scores": {
+            "CISO": 100, "CTO": 95, "IT Director": 80,
+            "VP Engineering": 85, "Security Manager": 70,
+        },
+        "role_default": 60,
+        "location_scores": {
+            "Hyderabad": 100, "Visakhapatnam": 88, "Vijayawada": 78,
+            "Andhra Pradesh": 72, "Chennai": 85, "Bengaluru": 95,
+        },
+        "location_default": 65,
+        "employee_tiers": [[2000, 100], [1000, 85], [500, 70]],
+        "employee_default": 55,
+        "budget_tiers": [[400, 100], [200, 85], [100, 70]],
+        "budget_default": 55,
+    },
+    "guardian": {
+        "allowed_locations": ["Hyderabad", "Visakhapatnam", "Vijayawada", "Chennai", "Bengaluru", "Andhra Pradesh"],
+        "senior_roles": ["CISO", "CTO", "VP Engineering", "IT Director", "Security Manager", "CEO", "COO"],
+        "budget_min": 50,
+        "budget_max": 600,
+        "bias_tolerance": 40,
+        "min_checks_passed": 4,
+    },
+}
+
+_WEIGHT_KEYS = ("role", "location", "employees", "budget")
+_HISTOGRAM_BUCKETS = 10
+
+
+def parse_budget(value) -> int:
+    return int(re.sub(r"[^\d]", "", str(value if value is not None else "0")) or "0")
+
+
+class Tiers:
+    """Threshold table: the highest threshold <= value wins, else `default`."""
+
+    def __init__(self, tiers: List[list], default: int):
+        pairs = sorted((int(t), int(s)) for t, s in tiers)
+        self.thresholds = [t for t, _ in pairs]
+        self.scores = [s for _, s in pairs]
+        self.default = int(default)
+
+    def lookup(self, value) -> int:
+        i = bisect.bisect_right(self.thresholds, value)
+        return self.scores[i - 1] if i else self.default
+
+
+class CompiledRules:
+    def __init__(self, raw: dict, version: int = 0):
+        hunter = raw["hunter"]
+        guardian = raw["guardian"]
+        weights = hunter["weights"]
+        missing = [k for k in _WEIGHT_KEYS if k not in weights]
+        if missing:
+            raise ValueError(f"hunter.weights missing: {', '.join(missing)}")
+        self.weights = tuple(float(weights[k]) for k in _WEIGHT_KEYS)
+        if any(w < 0 for w in self.weights):
+            raise ValueError("hunter.weights must be non-negative")
+
+        self.role_scores: Dict[str, int] = {k: int(v) for k, v in hunter["role_scores"].items()}
+        self.role_default = int(hunter["role_default"])
+        self.location_scores: Dict[str, int] = {k: int(v) for k, v in hunter["location_scores"].items()}
+        self.location_default = int(hunter["location_default"])
+        self.employee_tiers = Tiers(hunter["employee_tiers"], hunter["employee_default"])
+        self.budget_tiers = Tiers(hunter["budget_tiers"], hunter["budget_default"])
+
+        self.allowed_locations = frozenset(guardian["allowed_locations"])
+        self.senior_roles = frozenset(guardian["senior_roles"])
+        self.budget_min = int(guardian["budget_min"])
+        self.budget_max = int(guardian["budget_max"])
+        self.bias_tolerance = float(guardian["bias_tolerance"])
+        self.min_checks_passed = int(guardian["min_checks_passed"])
+
+        self.raw = raw
+        self.version = version
+
+    def components(self, lead: dict):
+        """(role, location, employees, budget) component scores for one lead."""
+        return (
+            self.role_scores.get(lead.get("role"), self.role_default),
+            self.location_scores.get(lead.get("location"), self.location_default),
+            self.employee_tiers.lookup(lead.get("employees", 500)),
+            self.budget_tiers.lookup(parse_budget(lead.get("budget", "0"))),
+        )
+
+    def blend(self, role_score, loc_score, emp_score, budget_score) -> int:
+        w_role, w_loc, w_emp, w_budget = self.weights
+        return round(w_role * role_score + w_loc * loc_score + w_emp * emp_score + w_budget * budget_score)
+
+    def score_columns(self, columns: "LeadColumns") -> List[int]:
+        """Score every lead in one pass over precomputed feature columns."""
+        role = map(self.role_scores.get, columns.roles, repeat(self.role_default))
+        loc = map(self.location_scores.get, columns.locations, repeat(self.location_default))
+        # Tier lookups are memoized per distinct value; real columns repeat heavily.
+        emp_tiers = {e: self.employee_tiers.lookup(e) for e in set(columns.employees)}
+        bud_tiers = {b: self.budget_tiers.lookup(b) for b in set(columns.budgets)}
+        emp = map(emp_tiers.__getitem__, columns.employees)
+        bud = map(bud_tiers.__getitem__, columns.budgets)
+        # Few distinct component tuples exist, so blend each once and map the rest in C.
+        components = list(zip(role, loc, emp, bud))
+        blended = {c: self.blend(*c) for c in set(components)}
+        return list(map(blended.__getitem__, components))
+
+
+class LeadColumns:
+    """Columnar view of the lead features Hunter scores on."""
+
+    def __init__(self, leads: List[dict]):
+        self.ids = [l.get("id") for l in leads]
+        self.companies = [l.get("company") for l in leads]
+        self.roles = [l.get("role") for l in leads]
+        self.locations = [l.get("location") for l in leads]
+        self.employees = [l.get("employees", 500) for l in leads]
+        self.budgets = [parse_budget(l.get("budget", "0")) for l in leads]
+
+    @classmethod
+    def from_columns(cls, columns: dict) -> "LeadColumns":
+        """Build from LeadStore.feature_columns(); each distinct budget string is parsed once."""
+        self = cls.__new__(cls)
+        self.ids = columns["ids"]
+        self.companies = columns["companies"]
+        self.roles = columns["roles"]
+        self.locations = columns["locations"]
+        self.employees = columns["employees"]
+        parsed = {b: parse_budget(b) for b in set(columns["budgets"])}
+        self.budgets = list(map(parsed.__getitem__, columns["budgets"]))
+        return self
+
+
+def validate_rules(raw: dict) -> dict:
+    """Check a complete rules document against the DEFAULT_RULES layout; returns `raw`."""
+    if not isinstance(raw, dict):
+        raise ValueError("Scoring rules must be a JSON object")
+    unknown = sorted(set(raw) - set(DEFAULT_RULES))
+    if unknown:
+        raise ValueError(f"Unknown rules section: {', '.join(unknown)}")
+    for section, defaults in DEFAULT_RULES.items():
+        values = raw.get(section)
+        if not isinstance(values, dict):
+            raise ValueError(f"Missing rules section: {section}")
+        missing = [k for k in defaults if k not in values]
+        if missing:
+            raise ValueError(f"{section} missing: {', '.join(missing)}")
+        for key, default in defaults.items():
+            expected = (int, float) if isinstance(default, (int, float)) else type(default)
+            if not isinstance(values[key], expected):
+                raise ValueError(f"{section}.{key} must be a {type(default).__name__}")
+    return raw
+
+
+def merge_rules(base: dict, overrides: dict) -> dict:
+    """Overlay `overrides` onto `base` section by section (dict values merge one level deeper).
+
+    Only used for what-if candidates; the rules file itself is loaded whole.
+    """
+    merged = copy.deepcopy(base)
+    for section, values in (overrides or {}).items():
+        if section not in merged or not isinstance(values, dict):
+            raise ValueError(f"Unknown rules section: {section}")
+        for key, value in values.items():
+            if isinstance(value, dict) and isinstance(merged[section].get(key), dict):
+                merged[section][key].update(value)
+            else:
+                merged[section][key] = value
+    return merged
+
+
+def compile_rules(raw: dict, version: int = 0) -> CompiledRules:
+    try:
+        return CompiledRules(raw, version)
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"Invalid scoring rules: {e}") from e
+
+
+def _distribution(scores: List[int]) -> dict:
+    if not scores:
+        return {"count": 0, "mean": 0, "median": 0, "p90": 0, "histogram": [0] * _HISTOGRAM_BUCKETS}
+    ordered = sorted(scores)
+    n = len(ordered)
+    histogram = [0] * _HISTOGRAM_BUCKETS
+    for s, count in Counter(ordered).items():
+        histogram[min(max(s, 0) * _HISTOGRAM_BUCKETS // 100, _HISTOGRAM_BUCKETS - 1)] += count
+    return {
+        "count": n,
+        "mean": round(sum(ordered) / n, 2),
+        "median": ordered[n // 2],
+        "p90": ordered[min(n - 1, int(n * 0.9))],
+        "histogram": histogram,
+    }
+
+
+def what_if(leads, current: CompiledRules, candidate: CompiledRules, top: int = 10) -> dict:
+    """Rescore `leads` (dicts or a LeadColumns) under both rule sets without touching them and report the deltas."""
+    columns = leads if isinstance(leads, LeadColumns) else LeadColumns(leads)
+    before = current.score_columns(columns)
+    after = candidate.score_columns(columns)
+    deltas = [a - b for a, b in zip(after, before)]
+    dist_before = _distribution(before)
+    dist_after = _distribution(after)
+    magnitudes = list(map(abs, deltas))
+    movers = heapq.nlargest(top, range(len(deltas)), key=magnitudes.__getitem__)
+    return {
+        "leads": len(columns.ids),
+        "changed": sum(1 for d in deltas if d),
+        "current": dist_before,
+        "candidate": dist_after,
+        "delta": {
+            "mean": round(dist_after["mean"] - dist_before["mean"], 2),
+            "median": dist_after["median"] - dist_before["median"],
+            "p90": dist_after["p90"] - dist_before["p90"],
+            "histogram": [a - b for a, b in zip(dist_after["histogram"], dist_before["histogram"])],
+        },
+        "top_movers": [
+            {"id": columns.ids[i], "company": columns.companies[i],
+             "current": before[i], "candidate": after[i], "delta": deltas[i]}
+            for i in movers if deltas[i]
+        ],
+    }
+
+
+class RulesStore:
+    def __init__(self, path: str = RULES_PATH):
+        self.path = path
+        self.rules = compile_rules(copy.deepcopy(DEFAULT_RULES))
+        self.mtime: Optional[float] = None
+        self.loaded_at = datetime.now().isoformat()
+        self.source = "defaults"
+        self.error = ""
+        self._lock = threading.Lock()
+
+    def get(self) -> CompiledRules:
+        """Current rules, recompiled first if the rules file changed on disk."""
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            mtime = None
+        if mtime != self.mtime:
+            self.reload()
+        return self.rules
+
+    def reload(self) -> CompiledRules:
+        with self._lock:
+            try:
+                mtime = os.stat(self.path).st_mtime
+            except OSError:
+                mtime = None
+            if mtime is None:
+                raw, source = copy.deepcopy(DEFAULT_RULES), "defaults"
+            else:
+                try:
+                    with open(self.path, encoding="utf-8") as fh:
+                        raw = validate_rules(json.load(fh))
+                    source = self.path
+                except (OSError, ValueError) as e:
+                    self.mtime = mtime
+                    self.error = str(e)[:200]
+                    return self.rules
+            try:
+                self.rules = compile_rules(raw, self.rules.version + 1)
+                self.source = source
+                self.error = ""
+                self.loaded_at = datetime.now().isoformat()
+            except ValueError as e:
+                self.error = str(e)[:200]
+            self.mtime = mtime
+            return self.rules
+
+    def info(self) -> dict:
+        return {
+            "version": self.rules.version,
+            "source": self.source,
+            "loaded_at": self.loaded_at,
+            "error": self.error,
+            "rules": self.rules.raw,
+        }
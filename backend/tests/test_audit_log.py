@@ -0,0 +1,124 @@
+import sqlite3
+
+import pytest
+
+from audit_log import AuditLog
+
+
+def _make_log(tmp_path, segment_size=10, hot_segments=1):
+    log = AuditLog(str(tmp_path / "audit.db"), archive_dir=str(tmp_path / "archive"),
+                   segment_size=segment_size, hot_segments=hot_segments)
+    log.compact_async = lambda: None     # compaction is driven explicitly below
+    log.init()
+    return log
+
+
+def _append(log, first, last):
+    for i in range(first, last + 1):
+        log.append({"agent": "Guardian", "action": "Compliance Passed", "target": f"Co {i % 3}"})
+
+
+@pytest.mark.parametrize("consumed_before_compaction", [1, 15, 25, 35])
+def test_query_survives_concurrent_compaction(tmp_path, consumed_before_compaction):
+    log = _make_log(tmp_path)
+    _append(log, 1, 35)
+    assert log.compact() == 2          # segments 0-1 archived, segment 2 hot, 5 active
+
+    it = log.query()
+    seen = [next(it)["seq"] for _ in range(consumed_before_compaction)]
+
+    _append(log, 36, 45)               # seals segment 3
+    assert log.compact() == 1          # archives segment 2 mid-query
+    seen += [e["seq"] for e in it]
+
+    assert seen == list(range(1, 46))
+
+
+def test_filtered_query_across_archive_and_hot(tmp_path):
+    log = _make_log(tmp_path)
+    _append(log, 1, 45)
+    log.compact()
+    expected = [e["seq"] for e in log.query() if e["target"] == "Co 1"]
+    assert [e["seq"] for e in log.query(target="Co 1")] == expected
+    assert [e["seq"] for e in log.query(target="Co 1", since_seq=12, limit=3)] == \
+        [s for s in expected if s > 12][:3]
+
+
+def test_reload_keeps_sequence(tmp_path):
+    log = _make_log(tmp_path)
+    _append(log, 1, 23)
+    log.compact()
+    reopened = _make_log(tmp_path)
+    assert reopened.count() == 23
+    assert [e["seq"] for e in reopened.tail(5)] == [19, 20, 21, 22, 23]
+
+
+def test_extend_seals_segments_in_one_pass(tmp_path):
+    log = _make_log(tmp_path)
+    compactions = []
+    log.compact_async = lambda: compactions.append(1)
+    stored = log.extend({"agent": "Hunter", "action": "Scored", "target": f"Co {i % 4}"} for i in range(1, 36))
+    assert [e["seq"] for e in stored] == list(range(1, 36))
+    assert len(compactions) == 1
+    assert log.compact() == 2
+    assert [e["seq"] for e in log.query()] == list(range(1, 36))
+    assert len(log.active) == 5
+    log.append({"agent": "Hunter", "target": "Co 0"})
+    assert _make_log(tmp_path).count() == 36
+
+
+def test_target_query_skips_archives_without_the_target(tmp_path):
+    log = _make_log(tmp_path)
+    log.extend({"agent": "Guardian", "target": f"Co {i // 10}"} for i in range(40))
+    log.compact()
+    opened = []
+    read = log._read_archive
+    log._read_archive = lambda segment, path: opened.append(segment) or read(segment, path)
+    assert [e["seq"] for e in log.query(target="Co 1")] == list(range(11, 21))
+    assert opened == [1]
+    assert [e["seq"] for e in log.query(target="Co 3")] == list(range(31, 41))
+    assert opened == [1]
+
+
+def test_target_index_backfilled_for_old_segments(tmp_path):
+    log = _make_log(tmp_path)
+    log.extend({"target": f"Co {i // 10}"} for i in range(40))
+    conn = sqlite3.connect(log.db_path)
+    conn.execute("DELETE FROM audit_segment_targets")
+    conn.execute("UPDATE audit_segments SET targets_indexed=0")
+    conn.commit()
+    conn.close()
+    log.compact()
+    assert [e["seq"] for e in log.query(target="Co 2")] == list(range(21, 31))
+    conn = sqlite3.connect(log.db_path)
+    assert conn.execute("SELECT COUNT(*) FROM audit_segment_targets").fetchone()[0] == 4
+    conn.close()
+
+
+def test_relative_archive_dir_follows_the_database(tmp_path, monkeypatch):
+    data = tmp_path / "data"
+    data.mkdir()
+    monkeypatch.chdir(data)
+    log = AuditLog("audit.db", archive_dir="audit_archive", segment_size=10, hot_segments=0)
+    log.compact_async = lambda: None
+    log.init()
+    log.extend({"target": "Co"} for _ in range(20))
+    log.compact()
+    assert len(list((data / "audit_archive").iterdir())) == 2
+
+    monkeypatch.chdir(tmp_path)
+    moved = AuditLog(str(data / "audit.db"), archive_dir="audit_archive", segment_size=10, hot_segments=0)
+    moved.init()
+    assert [e["seq"] for e in moved.query()] == list(range(1, 21))
+
+
+def test_missing_archive_raises(tmp_path):
+    log = _make_log(tmp_path, hot_segments=0)
+    log.extend({"target": "Co"} for _ in range(20))
+    log.compact()
+    victim = sorted((tmp_path / "archive").iterdir())[0]
+    victim.unlink()
+    assert log.missing_archives() == [str(victim)]
+    with pytest.raises(FileNotFoundError, match="segment 0"):
+        list(log.query())
+    assert [e["seq"] for e in log.query(since_seq=10)] == list(range(11, 21))
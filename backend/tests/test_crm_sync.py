@@ -0,0 +1,160 @@
+import threading
+
+import pytest
+
+import crm_sync
+from crm_sync import CRMError, CRMAdapter, HTTPCRMAdapter, SimulatedCRMAdapter, SyncEngine
+from mock_crm import MockCRM, serve
+
+
+class DownCRMAdapter(CRMAdapter):
+    name = "down"
+
+    def upsert_opportunities(self, records):
+        raise CRMError("HTTP 503: Service Unavailable")
+
+
+def _leads(n):
+    return [{"id": f"L-{i}", "company": f"Co {i}", "role": "CTO", "location": "Hyderabad",
+             "employees": 500, "budget": "200", "icp_score": 80} for i in range(n)]
+
+
+def _engine(tmp_path, adapter, **kwargs):
+    engine = SyncEngine(str(tmp_path / "nexus.db"), adapter, **kwargs)
+    engine.init()
+    return engine
+
+
+def _make_due(engine):
+    conn = engine._connect()
+    conn.execute("UPDATE crm_outbox SET next_attempt_at=0 WHERE status='pending'")
+    conn.commit()
+    conn.close()
+
+
+def _outbox(engine, lead_id):
+    conn = engine._connect()
+    row = conn.execute("SELECT status, attempts, next_attempt_at, crm_id FROM crm_outbox WHERE lead_id=?",
+                       (lead_id,)).fetchone()
+    conn.close()
+    return row
+
+
+@pytest.fixture
+def mock_crm():
+    crm = MockCRM(fail_rate=0.3, record_fail_rate=0.1, seed=7)
+    server = serve(crm, 0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    adapter = HTTPCRMAdapter(f"http://127.0.0.1:{server.server_address[1]}", pool_size=2)
+    yield crm, adapter
+    adapter.close()
+    server.shutdown()
+    server.server_close()
+
+
+def test_reenqueue_is_a_noop(tmp_path):
+    engine = _engine(tmp_path, SimulatedCRMAdapter())
+    leads = _leads(5)
+    assert engine.enqueue(leads) == 5
+    assert engine.enqueue(leads[:3]) == 0
+    report = engine.flush()
+    assert report["sent"] == 5 and report["failed"] == 0
+    assert engine.enqueue(leads) == 0
+    assert engine.flush()["batches"] == 0
+    assert engine.stats()["sent"] == 5
+
+
+def test_retries_against_mock_crm_never_duplicate_opportunities(tmp_path, mock_crm):
+    crm, adapter = mock_crm
+    engine = _engine(tmp_path, adapter, batch_size=7, concurrency=2, max_attempts=50)
+    leads = _leads(60)
+    engine.enqueue(leads)
+
+    synced, partial = [], False
+    for _ in range(40):
+        report = engine.flush()
+        synced += report["synced"]
+        partial = partial or (report["sent"] and report["failed"])
+        if engine.stats()["pending"] == 0:
+            break
+        _make_due(engine)
+
+    stats = crm.stats()
+    outbox = engine.stats()
+    assert (outbox["pending"], outbox["sent"], outbox["dead"]) == (0, 60, 0)
+    assert partial and stats["injected_failures"] > 0
+    assert stats["opportunities"] == 60
+    assert sorted(r["external_id"] for r in crm.opportunities.values()) == sorted(l["id"] for l in leads)
+    assert len({s["crm_id"] for s in synced}) == 60
+    # 503s after the CRM applied a batch come back as "duplicate" on retry, not as new opportunities
+    assert all(crm.by_external[s["lead_id"]] == s["crm_id"] for s in synced)
+
+
+def test_failures_back_off_until_dead(tmp_path):
+    engine = _engine(tmp_path, DownCRMAdapter(), max_attempts=3)
+    engine.enqueue(_leads(2))
+
+    for attempt in (1, 2, 3):
+        report = engine.flush()
+        assert report["failed"] == 2 and report["sent"] == 0
+        status, attempts, _, _ = _outbox(engine, "L-0")
+        assert attempts == attempt
+        if attempt < 3:
+            assert status == "pending" and report["dead"] == 0
+            assert engine.flush()["batches"] == 0           # not due yet
+            _make_due(engine)
+    assert status == "dead" and report["dead"] == 2
+    assert all(f["dead"] and "503" in f["error"] for f in report["failures"])
+    assert engine.stats()["dead"] == 2
+    _make_due(engine)
+    assert engine.flush()["batches"] == 0                   # dead rows are never retried on their own
+
+
+def test_backoff_doubles_per_attempt(tmp_path, monkeypatch):
+    monkeypatch.setattr(crm_sync.time, "time", lambda: 1000.0)
+    engine = _engine(tmp_path, DownCRMAdapter(), max_attempts=10)
+    engine.enqueue(_leads(1))
+    waits = []
+    for _ in range(4):
+        engine.flush()
+        waits.append(_outbox(engine, "L-0")[2] - 1000.0)
+        _make_due(engine)
+    assert waits == [2.0, 4.0, 8.0, 16.0]
+
+
+def test_requeue_dead_rearms_rows(tmp_path):
+    engine = _engine(tmp_path, DownCRMAdapter(), max_attempts=1)
+    engine.enqueue(_leads(3))
+    assert engine.flush()["dead"] == 3
+    assert sorted(engine.requeue_dead()) == ["L-0", "L-1", "L-2"]
+    assert engine.requeue_dead() == []
+    assert _outbox(engine, "L-1")[:2] == ("pending", 0)
+
+    engine.adapter = SimulatedCRMAdapter()
+    assert engine.flush()["sent"] == 3
+    assert engine.stats()["dead"] == 0
+
+
+def test_failed_leads_recover_after_requeue(tmp_path):
+    leads = {l["id"]: dict(l, crm_sync="Pending") for l in _leads(2)}
+    leads["L-1"]["crm_sync"] = "Synced"
+    engine = _engine(tmp_path, DownCRMAdapter(), max_attempts=1)
+    engine.enqueue(list(leads.values()))
+
+    assert crm_sync.apply_report(engine.flush(), leads.get) == []
+    assert leads["L-0"]["crm_sync"] == "Failed" and "503" in leads["L-0"]["last_log"]
+    assert leads["L-1"]["crm_sync"] == "Synced"
+
+    assert crm_sync.reopen_failed(engine.requeue_dead(), leads.get) == 1
+    assert leads["L-0"]["crm_sync"] == "Retrying"
+    engine.adapter = SimulatedCRMAdapter()
+    newly = crm_sync.apply_report(engine.flush(), leads.get)
+    assert [lead["id"] for lead, _ in newly] == ["L-0"]
+    assert leads["L-0"]["crm_sync"] == "Synced" and leads["L-0"]["crm_id"] == newly[0][1]["crm_id"]
+
+
+def test_late_success_still_syncs_a_failed_lead():
+    leads = {"L-0": {"id": "L-0", "crm_sync": "Failed"}}
+    report = {"synced": [{"lead_id": "L-0", "crm_id": "OPP-1", "status": "duplicate"}], "failures": []}
+    assert len(crm_sync.apply_report(report, leads.get)) == 1
+    assert leads["L-0"]["crm_sync"] == "Synced"
@@ -0,0 +1,159 @@
+import pytest
+
+import entity_resolution
+from entity_resolution import (
+    EntityIndex, _absorb, company_keys, jaccard, normalize_company, normalize_location, normalize_role, shingles,
+)
+
+
+def _lead(lead_id, company, location="Hyderabad", status="New", **extra):
+    return dict(id=lead_id, company=company, location=location, status=status, **extra)
+
+
+def _rows(leads):
+    return [(l["id"], l["company"], l["location"], l["status"], bool(l.get("entity_key"))) for l in leads]
+
+
+@pytest.fixture
+def store():
+    return {}
+
+
+@pytest.fixture
+def index(tmp_path, store):
+    idx = EntityIndex(fetch=store.get, db_path=str(tmp_path / "nexus.db"))
+    idx.init()
+    idx.load()
+    return idx
+
+
+def _resolve(index, store, leads):
+    for lead in leads:
+        store[lead["id"]] = lead
+    absorbed, report = index.resolve_rows(_rows(leads))
+    for lead_id in absorbed:
+        del store[lead_id]
+    return absorbed, report
+
+
+# -- normalization ------------------------------------------------------------
+
+def test_aliases_fold_to_canonical_names():
+    assert normalize_location(" vizag ") == "Visakhapatnam"
+    assert normalize_location("Pune") == "Pune"
+    assert normalize_role("Chief Technology Officer") == "CTO"
+
+
+def test_legal_suffixes_always_stripped():
+    assert normalize_company("Cyberdyne Systems Pvt. Ltd.") == "cyberdyne systems"
+    assert normalize_company("Infosys Ltd") == "infosys"
+
+
+def test_generic_words_and_city_kept_when_too_little_remains():
+    assert company_keys("Hyderabad Pharma", "Hyderabad") == ("hyderabad pharma", "hyderabad pharma")
+    assert company_keys("Pharma Solutions Pvt Ltd", "Hyderabad") == ("pharma solutions", "pharma solutions")
+    assert normalize_company("Global Services") == "global services"
+    assert normalize_company("Global Industries") == "global industries"
+
+
+def test_generic_words_and_city_stripped_when_enough_remains():
+    assert company_keys("Cyberdyne Systems Hyderabad", "Hyderabad") == ("cyberdyne systems", "cyberdyne systems")
+    assert company_keys("Tata Consultancy Services", "Chennai") == ("tata consultancy", "tata consultancy services")
+
+
+# -- LSH candidates -------------------------------------------------------------
+
+def test_near_duplicates_share_a_band_bucket():
+    idx = EntityIndex()
+    a = idx._band_keys("Hyderabad", shingles("cyberdyne systems"))
+    b = idx._band_keys("Hyderabad", shingles("cyberdyne system"))
+    other_city = idx._band_keys("Chennai", shingles("cyberdyne systems"))
+    assert set(a) & set(b)
+    assert not set(a) & set(other_city)
+
+
+def test_match_requires_jaccard_and_same_location():
+    idx = EntityIndex()
+    for lead_id, company, location in (("A", "Cyberdyne Systems", "Hyderabad"), ("B", "Cyberdyne Systems", "Chennai")):
+        key, name = company_keys(company, location)
+        idx._add(lead_id, location, key, name, idx._band_keys(location, shingles(key)))
+    key, name = company_keys("Cyberdyne Systemz", "Hyderabad")
+    assert idx._match("Hyderabad", key, name, idx._band_keys("Hyderabad", shingles(key))) == "A"
+    key, name = company_keys("Skynet Labs", "Hyderabad")
+    assert idx._match("Hyderabad", key, name, idx._band_keys("Hyderabad", shingles(key))) is None
+    assert jaccard(shingles("cyberdyne systems"), shingles("skynet labs")) < entity_resolution.SIMILARITY_THRESHOLD
+
+
+# -- resolve_rows ------------------------------------------------------------------
+
+def test_resolve_rows_merges_duplicates(index, store):
+    leads = [
+        _lead("L-1", "Cyberdyne Systems Pvt Ltd", role="CTO"),
+        _lead("L-2", "CYBERDYNE SYSTEMS", location="hyd", budget="$250K"),
+        _lead("L-3", "Cyberdyne Systems", location="Chennai"),
+        _lead("L-4", "Skynet Labs"),
+    ]
+    absorbed, report = _resolve(index, store, leads)
+    assert absorbed == ["L-2"]
+    assert report["merged"] == 1 and report["entities"] == 3
+    assert store["L-1"]["merged_ids"] == ["L-2"]
+    assert store["L-1"]["budget"] == "$250K"
+
+
+def test_distinct_same_city_companies_do_not_merge(index, store):
+    leads = [
+        _lead("L-1", "Hyderabad Pharma"),
+        _lead("L-2", "Pharma Solutions Pvt Ltd"),
+        _lead("L-3", "Global Services"),
+        _lead("L-4", "Global Industries"),
+    ]
+    absorbed, report = _resolve(index, store, leads)
+    assert absorbed == []
+    assert report["entities"] == 4
+
+
+def test_processed_leads_are_never_absorbed(index, store):
+    leads = [_lead("L-1", "Cyberdyne Systems"), _lead("L-2", "Cyberdyne Systems", status="Scored")]
+    absorbed, _ = _resolve(index, store, leads)
+    assert absorbed == []
+
+
+def test_index_persists_across_restarts(tmp_path, index, store):
+    _resolve(index, store, [_lead("L-1", "Cyberdyne Systems"), _lead("L-2", "Skynet Labs")])
+    reopened = EntityIndex(fetch=store.get, db_path=index.db_path)
+    assert reopened.load() == 2
+    absorbed, report = _resolve(reopened, store, [_lead("L-3", "Cyberdyne Systemz")])
+    assert absorbed == ["L-3"]
+    assert report["scanned"] == 1 and report["merged_total"] == 1
+    assert store["L-1"]["merged_ids"] == ["L-3"]
+
+
+def test_load_discards_rows_from_other_lsh_parameters(index, store):
+    _resolve(index, store, [_lead("L-1", "Cyberdyne Systems")])
+    assert EntityIndex(bands=5, rows=8, db_path=index.db_path).load() == 0
+
+
+# -- _absorb / unmerge --------------------------------------------------------------
+
+def test_absorb_fills_gaps_on_new_survivors_only():
+    survivor = {"id": "A", "status": "New", "budget": "", "role": "CTO"}
+    inherited = _absorb(survivor, {"id": "B", "status": "New", "budget": "$300K", "role": "CISO"})
+    assert inherited == {"budget": ""}
+    assert survivor == {"id": "A", "status": "New", "budget": "$300K", "role": "CTO", "merged_ids": ["B"]}
+    assert _absorb(survivor, {"id": "B"}) == {}
+    assert survivor["merged_ids"] == ["B"]
+
+    scored = {"id": "C", "status": "Scored", "budget": ""}
+    assert _absorb(scored, {"id": "D", "budget": "$1M"}) == {}
+    assert scored == {"id": "C", "status": "Scored", "budget": "", "merged_ids": ["D"]}
+
+
+def test_unmerge_restores_record_and_survivor(index, store):
+    _resolve(index, store, [_lead("L-1", "Cyberdyne Systems"), _lead("L-2", "Cyberdyne Systems", budget="$250K")])
+    assert store["L-1"]["budget"] == "$250K"
+    record = index.unmerge("L-2")
+    assert record["id"] == "L-2" and record["budget"] == "$250K"
+    assert store["L-1"]["merged_ids"] == [] and store["L-1"]["budget"] is None
+    assert "L-2" in index.entities
+    assert index.unmerge("L-2") is None
+    assert EntityIndex(db_path=index.db_path).load() == 2
@@ -0,0 +1,206 @@
+import json
+import sqlite3
+import threading
+
+import pytest
+
+import lead_store
+from lead_store import LeadStore
+
+
+def _leads(n):
+    return [
+        {"id": f"L-{i}", "company": f"Company {i}", "location": "Hyderabad", "role": "CTO",
+         "status": "New" if i % 2 else "Scored", "safety_check": "Pending",
+         "icp_score": i % 100, "entity_key": f"hyderabad|company {i}"}
+        for i in range(n)
+    ]
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return str(tmp_path / "leads.snap"), str(tmp_path / "nexus.db")
+
+
+def _journal_rows(db):
+    conn = sqlite3.connect(db)
+    n = conn.execute("SELECT COUNT(*) FROM lead_journal").fetchone()[0]
+    conn.close()
+    return n
+
+
+def test_save_open_mutate_journal_reopen(paths):
+    snap, db = paths
+    store = LeadStore.from_list(_leads(1000))
+    assert store.save(snap, db) == "snapshot"
+    store.close()
+
+    store, timing = LeadStore.open(snap, db)
+    assert timing["leads"] == 1000 and store.hydrated_count() == 0
+    assert store.count(status="New") == 500
+    assert json.loads(store.to_json()) == _leads(1000)
+
+    lead = store.first(status="New")
+    lead["status"] = "Scored"
+    lead["icp_score"] = 91
+    store.by_id("L-10")["safety_check"] = "Passed"
+    assert store.save(snap, db) == "journal"
+    assert _journal_rows(db) == 2
+    assert store.save(snap, db) == "clean"
+    store.close()
+
+    reopened, timing = LeadStore.open(snap, db)
+    assert timing["journal_rows"] == 2 and reopened.hydrated_count() == 0
+    assert reopened.count(status="New") == 499
+    assert reopened.count(safety="Passed") == 1
+    assert reopened.by_id(lead["id"])["icp_score"] == 91
+    assert reopened.score_stats() == store.score_stats()
+    reopened.close()
+
+
+def test_journal_compacts_into_snapshot(paths, monkeypatch):
+    monkeypatch.setattr(lead_store, "JOURNAL_COMPACT_MIN", 16)
+    snap, db = paths
+    store = LeadStore.from_list(_leads(300))
+    store.save(snap, db)
+    for lead in store.select(status="New", limit=10):
+        lead["status"] = "Scored"
+    assert store.save(snap, db) == "journal"
+    for lead in store.select(status="New"):
+        lead["status"] = "Scored"
+    assert store.save(snap, db) == "snapshot"
+    assert _journal_rows(db) == 0
+    store.close()
+    reopened, _ = LeadStore.open(snap, db)
+    assert reopened.count(status="Scored") == 300
+    reopened.close()
+
+
+def test_remove_ids_then_snapshot_rewrite(paths):
+    snap, db = paths
+    store = LeadStore.from_list(_leads(50))
+    store.save(snap, db)
+    store.close()
+
+    store, _ = LeadStore.open(snap, db)
+    survivor = store.by_id("L-40")          # hydrated before the remap
+    assert store.remove_ids(["L-3", "L-7", "missing"]) == 2
+    survivor["last_log"] = "touched after remap"
+    assert store.save(snap, db) == "snapshot"
+    store.close()
+
+    reopened, _ = LeadStore.open(snap, db)
+    ids = [lead["id"] for lead in reopened.iter_dicts()]
+    assert len(reopened) == 48 and "L-3" not in ids and "L-7" not in ids
+    assert ids == [f"L-{i}" for i in range(50) if i not in (3, 7)]
+    assert reopened.by_id("L-40")["last_log"] == "touched after remap"
+    assert reopened.by_id("L-39")["id"] == "L-39"
+    reopened.close()
+
+
+def test_crash_between_snapshot_replace_and_journal_delete(paths, monkeypatch):
+    snap, db = paths
+    store = LeadStore.from_list(_leads(20))
+    store.save(snap, db)
+    store.by_id("L-15")["status"] = "Nurtured"
+    assert store.save(snap, db) == "journal"
+
+    store.remove_ids(["L-0", "L-1"])        # shifts every position down by two
+
+    def crash(db_path):
+        raise RuntimeError("simulated crash")
+
+    monkeypatch.setattr(lead_store, "_init_journal", crash)
+    with pytest.raises(RuntimeError):
+        store.save(snap, db)                # snapshot replaced, journal rows left behind
+    monkeypatch.undo()
+    assert _journal_rows(db) == 1
+
+    reopened, timing = LeadStore.open(snap, db)
+    assert timing["journal_rows"] == 0      # stale generation is ignored
+    assert [l["id"] for l in reopened.iter_dicts()] == [f"L-{i}" for i in range(2, 20)]
+    assert reopened.by_id("L-15")["status"] == "Nurtured"
+    assert reopened.by_id("L-13")["status"] == "New"
+    reopened.close()
+
+
+def test_concurrent_mutation_remap_and_save(paths):
+    snap, db = paths
+    store = LeadStore.from_list(_leads(2000))
+    store.save(snap, db)
+    errors = []
+
+    def mutate():
+        try:
+            for i in range(1000, 2000):
+                lead = store.by_id(f"L-{i}")
+                if lead is not None:
+                    lead["last_log"] = f"m{i}"
+        except Exception as e:
+            errors.append(e)
+
+    def remove():
+        try:
+            for i in range(0, 200, 2):
+                store.remove_ids([f"L-{i}"])
+        except Exception as e:
+            errors.append(e)
+
+    def save():
+        try:
+            for _ in range(20):
+                store.save(snap, db)
+                store.count(status="New")
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=f) for f in (mutate, remove, save)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
+    store.save(snap, db)
+    store.close()
+
+    reopened, _ = LeadStore.open(snap, db)
+    assert len(reopened) == 1900
+    assert all(reopened.by_id(f"L-{i}")["last_log"] == f"m{i}" for i in range(1000, 2000))
+    reopened.close()
+
+
+def _features(leads):
+    return {
+        "ids": [l["id"] for l in leads],
+        "roles": [l.get("role", "") for l in leads],
+        "employees": [l.get("employees", 500) for l in leads],
+        "budgets": [l.get("budget", "") for l in leads],
+    }
+
+
+def test_feature_columns_follow_records(paths):
+    snap, db = paths
+    leads = _leads(40)
+    for i, lead in enumerate(leads):
+        lead.update(employees=100 * i, budget=f"${i}K")
+    store = LeadStore.from_list(leads)
+    store.save(snap, db)
+    store.close()
+
+    store, _ = LeadStore.open(snap, db)
+    cols = store.feature_columns()
+    assert store.hydrated_count() == 0
+    assert {k: cols[k] for k in ("ids", "roles", "employees", "budgets")} == _features(leads)
+
+    store.by_id("L-3").update(role="CISO", employees=2500, budget="$450K")
+    assert store.feature_columns()["roles"][3] == "CISO"
+    store.save(snap, db)
+    store.close()
+
+    reopened, _ = LeadStore.open(snap, db)
+    assert reopened._stale_features == {3}
+    cols = reopened.feature_columns()
+    assert (cols["roles"][3], cols["employees"][3], cols["budgets"][3]) == ("CISO", 2500, "$450K")
+    reopened.remove_ids(["L-0"])
+    assert reopened.feature_columns()["employees"][:2] == [100, 200]
+    reopened.close()
@@ -0,0 +1,40 @@
+import retrieval
+from retrieval import MIN_HIT_SCORE, VectorIndex, expand_query, location_terms
+
+PASSAGES = [
+    "Cyber security threat briefing for the CTO: ransomware crews target manufacturing firms.",
+    "A CTO should treat every cyber security threat report as a board-level risk.",
+    "Hyderabad pharma companies in HITEC City saw a rise in phishing campaigns last quarter.",
+    "Chennai logistics operators near Ennore port are upgrading OT network monitoring.",
+    "Quarterly revenue grew in the consumer segment with no notable security incidents.",
+]
+
+
+def _search(location, role="CTO"):
+    index = VectorIndex(PASSAGES)
+    return index.search(expand_query(location, role), k=3, anchor=location_terms(location))
+
+
+def test_generic_terms_do_not_make_a_hit():
+    hits = _search("Pune")
+    assert hits, "generic terms should still rank passages"
+    assert all(score < MIN_HIT_SCORE for score, _ in hits)
+
+
+def test_location_passage_is_a_hit():
+    hits = _search("Hyderabad")
+    good = [p for score, p in hits if score >= MIN_HIT_SCORE]
+    assert good == [PASSAGES[2]]
+
+
+def test_region_terms_count_toward_quality():
+    index = VectorIndex(PASSAGES)
+    hits = index.search(expand_query("Chennai", "CTO"), k=5, anchor=[("Ennore port", 1.0)])
+    assert max(hits)[1] == PASSAGES[3]
+
+
+def test_without_anchor_generic_terms_clear_the_threshold():
+    index = VectorIndex(PASSAGES)
+    ranked = index.search(expand_query("Pune", "CTO"), k=3)
+    assert ranked[0][0] >= MIN_HIT_SCORE
+    assert retrieval.location_terms("Pune") == [("Pune", 2.0)]
@@ -0,0 +1,78 @@
+import copy
+import json
+import os
+
+import pytest
+
+import scoring_rules
+from scoring_rules import DEFAULT_RULES, RulesStore
+
+
+def _write(path, raw, bump=0):
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump(raw, fh)
+    if bump:
+        st = os.stat(path)
+        os.utime(path, (st.st_atime, st.st_mtime + bump))
+
+
+def test_file_replaces_defaults(tmp_path):
+    path = str(tmp_path / "rules.json")
+    raw = copy.deepcopy(DEFAULT_RULES)
+    raw["hunter"]["role_scores"] = {"CTO": 50}
+    _write(path, raw)
+    rules = RulesStore(path).get()
+    assert rules.role_scores == {"CTO": 50}
+    assert rules.components({"role": "CISO"})[0] == rules.role_default
+
+
+def test_partial_file_is_rejected_and_previous_rules_kept(tmp_path):
+    path = str(tmp_path / "rules.json")
+    _write(path, DEFAULT_RULES)
+    store = RulesStore(path)
+    before = store.get()
+    _write(path, {"hunter": {"role_scores": {"CTO": 50}}}, bump=5)
+    after = store.get()
+    assert after is before
+    assert store.error.startswith("hunter missing: weights")
+    assert after.role_scores["CISO"] == 100
+
+
+def test_validate_rules_rejects_unknown_sections_and_bad_types():
+    raw = copy.deepcopy(DEFAULT_RULES)
+    raw["extra"] = {}
+    with pytest.raises(ValueError, match="Unknown rules section"):
+        scoring_rules.validate_rules(raw)
+    raw = copy.deepcopy(DEFAULT_RULES)
+    raw["hunter"]["role_scores"] = [["CTO", 50]]
+    with pytest.raises(ValueError, match="role_scores"):
+        scoring_rules.validate_rules(raw)
+
+
+def test_what_if_still_overlays_candidate():
+    merged = scoring_rules.merge_rules(DEFAULT_RULES, {"hunter": {"role_scores": {"CTO": 50}}})
+    assert merged["hunter"]["role_scores"]["CTO"] == 50
+    assert merged["hunter"]["role_scores"]["CISO"] == 100
+
+
+def test_what_if_from_columns_matches_dicts():
+    leads = [
+        {"id": f"L-{i}", "company": f"Co {i}", "role": role, "location": loc, "employees": emp, "budget": budget}
+        for i, (role, loc, emp, budget) in enumerate([
+            ("CTO", "Hyderabad", 2500, "$450K"), ("CISO", "Pune", 300, "$90K"),
+            ("CEO", "Chennai", 1200, ""), ("CTO", "Bengaluru", 500, "$200K"),
+        ])
+    ]
+    current = scoring_rules.compile_rules(DEFAULT_RULES)
+    candidate = scoring_rules.compile_rules(
+        scoring_rules.merge_rules(DEFAULT_RULES, {"hunter": {"role_scores": {"CTO": 50}}})
+    )
+    columns = scoring_rules.LeadColumns.from_columns({
+        "ids": [l["id"] for l in leads], "companies": [l["company"] for l in leads],
+        "roles": [l["role"] for l in leads], "locations": [l["location"] for l in leads],
+        "employees": [l["employees"] for l in leads], "budgets": [l["budget"] for l in leads],
+    })
+    report = scoring_rules.what_if(columns, current, candidate)
+    assert report == scoring_rules.what_if(leads, current, candidate)
+    assert report["changed"] == 2
+    assert [current.blend(*current.components(l)) for l in leads] == current.score_columns(columns)